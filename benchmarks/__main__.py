@@ -0,0 +1,46 @@
+from benchmarks.harness import Runner, compare_baseline, save_baseline
+from benchmarks.suite import bench_catalog, bench_cog, bench_et_time, bench_map_render
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the bot hot paths, offline and with fixtures")
+    parser.add_argument("-k", "--filter", help="only run the benchmarks whose name contains this")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated alert counts of the reminder_loop tick benchmarks")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the number of runs")
+    parser.add_argument("--save", metavar="PATH", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="p50 slowdown reported as a regression, 0.10 is 10%%")
+    args = parser.parse_args()
+
+    # The catalog and the assets are loaded relative to the repository root
+    os.chdir(BASE_DIR)
+    runner = Runner(args.filter, args.scale)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    with tempfile.TemporaryDirectory(prefix="panda_bench_") as work_dir:
+        bench_et_time(runner)
+        bench_catalog(runner, work_dir)
+        bench_map_render(runner, work_dir)
+        asyncio.run(bench_cog(runner, work_dir, sizes))
+
+    if args.save:
+        save_baseline(args.save, runner.results)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        regressions = compare_baseline(args.compare, runner.results, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from models import GatheringItem, GatheringReminder
+from PIL import Image, ImageDraw
+import os
+import random
+
+
+def map_fixture(directory: str, size: int = 2048) -> str:
+    """
+    Write a raw zone map stand-in, same size and format as the GarlandTools maps.
+    """
+    path = os.path.join(directory, "fixture_map.png")
+    image = Image.new("RGB", (size, size), (214, 196, 160))
+    draw = ImageDraw.Draw(image)
+    rng = random.Random(0)
+    for _ in range(400):
+        x, y = rng.randrange(size), rng.randrange(size)
+        radius = rng.randrange(10, 120)
+        colour = (rng.randrange(90, 200), rng.randrange(110, 190), rng.randrange(80, 160))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=colour)
+    image.save(path, format="PNG")
+    return path
+
+
+class FixtureHttpClient:
+    """
+    HttpClient stand-in serving every file from a local fixture.
+    """
+
+    def __init__(self, map_file: str):
+        self.map_file = map_file
+
+    async def get_file(self, path: str, max_age=None) -> str:
+        return self.map_file
+
+    async def close(self) -> None:
+        pass
+
+
+def keystrokes(items: list[GatheringItem], words: int = 50, seed: int = 0) -> list[list[str]]:
+    """
+    What the autocomplete sees while item names are typed one key at a time,
+    every tenth name with a typo.
+    """
+    rng = random.Random(seed)
+    sequences = []
+    for i, item in enumerate(rng.sample(list(items), min(words, len(items)))):
+        name = item.name
+        if i % 10 == 0 and len(name) > 4:
+            typo_at = rng.randrange(1, len(name) - 1)
+            name = name[:typo_at] + name[typo_at + 1] + name[typo_at] + name[typo_at + 2:]
+        sequences.append([name[:length] for length in range(1, len(name) + 1)])
+    return sequences
+
+
+def synthetic_alerts(
+        items: list[GatheringItem],
+        count: int,
+        channel_ids: list[int],
+        seed: int = 0,
+) -> list[GatheringReminder]:
+    rng = random.Random(seed)
+    alerts = []
+    for user_id in range(1, count + 1):
+        item = rng.choice(items)
+        alerts.append(GatheringReminder(
+            user_id=user_id,
+            channel_id=rng.choice(channel_ids),
+            item_id=item.id,
+            item_name=item.name,
+            et_hours=item.node.time,
+            duration_et_hours=item.node.node_duration,
+            alert_before_minutes=rng.choice((1, 2, 5, 10)),
+            enable=True,
+            last_notification_ts="",
+        ))
+    return alerts
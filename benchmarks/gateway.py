@@ -0,0 +1,213 @@
+from dataclasses import dataclass, field
+from typing import Optional
+from utils.rate_limit import TokenBucket
+import asyncio
+import discord
+import itertools
+import random
+import time
+
+# Discord signs attachment URLs for about a day
+ATTACHMENT_URL_TTL = 24 * 60 * 60
+
+
+@dataclass
+class FakeAttachment:
+    filename: str
+    url: str
+    size: int
+
+
+@dataclass
+class SentMessage:
+    """
+    A message as recorded by the gateway, also returned by the sends like a
+    discord.Message: an uploaded file shows in attachments with a signed CDN URL.
+    """
+    at: float
+    kind: str
+    target_id: int
+    content: Optional[str]
+    has_view: bool
+    has_file: bool
+    attachments: list[FakeAttachment] = field(default_factory=list)
+
+
+class _RateLimitedResponse:
+    status = 429
+    reason = "Too Many Requests"
+
+
+class FakeGateway:
+    """
+    Stands in for the Discord REST API: every call waits for a simulated round
+    trip and goes through a global and a per channel rate limit bucket.
+
+    Over the limit a call counts a 429 and, like discord.py, sleeps for the
+    retry delay and tries again. With raise_on_429 the 429 surfaces as a
+    discord.HTTPException instead. A rate of None disables that bucket.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.05,
+            jitter: float = 0.02,
+            channel_rate: Optional[float] = 1.0,
+            channel_burst: float = 5.0,
+            global_rate: Optional[float] = 50.0,
+            raise_on_429: bool = False,
+            seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.raise_on_429 = raise_on_429
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate) if global_rate else None
+        self.sent: list[SentMessage] = []
+        self.requests = 0
+        self.rate_limited = 0
+        self._channel_buckets: dict[int, TokenBucket] = {}
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+
+    async def request(self, channel_id: Optional[int] = None) -> None:
+        self.requests += 1
+        buckets = [self.global_bucket] if self.global_bucket is not None else []
+        if channel_id is not None and self.channel_rate:
+            bucket = self._channel_buckets.get(channel_id)
+            if bucket is None:
+                bucket = self._channel_buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_burst)
+            buckets.append(bucket)
+
+        while buckets:
+            retry_after = max(bucket.delay() for bucket in buckets)
+            if retry_after == 0:
+                for bucket in buckets:
+                    bucket.try_acquire()
+                break
+
+            self.rate_limited += 1
+            if self.raise_on_429:
+                raise discord.HTTPException(
+                    _RateLimitedResponse(),  # noqa
+                    {"message": "You are being rate limited.", "retry_after": retry_after},
+                )
+            await asyncio.sleep(retry_after)
+
+        if self.latency:
+            await asyncio.sleep(max(0.0, self._rng.gauss(self.latency, self.jitter)))
+
+    def record(self, kind: str, target_id: int, content=None, view=None, file=None) -> SentMessage:
+        message = SentMessage(time.monotonic(), kind, target_id, content, view is not None, file is not None)
+        if file is not None:
+            message.attachments.append(self._attachment(target_id, file))
+        self.sent.append(message)
+        return message
+
+    def _attachment(self, channel_id: int, file: discord.File) -> FakeAttachment:
+        expires_at = int(time.time() + ATTACHMENT_URL_TTL)
+        url = (
+            f"https://cdn.discordapp.com/attachments/{channel_id}/{next(self._ids)}/{file.filename}"
+            f"?ex={expires_at:x}&is={int(time.time()):x}&hm=0&"
+        )
+        return FakeAttachment(file.filename, url, len(file.fp.getbuffer()))
+
+    @property
+    def uploaded_bytes(self) -> int:
+        return sum(attachment.size for message in self.sent for attachment in message.attachments)
+
+
+class FakeChannel:
+    def __init__(self, gateway: FakeGateway, channel_id: int, guild_id: int):
+        self.gateway = gateway
+        self.id = channel_id
+        self.guild_id = guild_id
+
+    async def send(self, content=None, *, view=None, file=None, **kwargs):
+        await self.gateway.request(self.id)
+        return self.gateway.record("channel", self.id, content, view, file)
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, content=None, view=None, file=None) -> None:
+        if self._done:
+            raise discord.InteractionResponded(self.interaction)  # noqa
+        self._done = True
+        await self.interaction.gateway.request()
+        self.interaction.responded_at = self.interaction.responded_at or time.perf_counter()
+        self.interaction.gateway.record("response", self.interaction.channel_id, content, view, file)
+
+    async def defer(self, ephemeral: bool = False, thinking: bool = False) -> None:
+        await self._respond()
+
+    async def send_message(self, content=None, *, view=None, file=None, ephemeral: bool = False, **kwargs) -> None:
+        await self._respond(content, view, file)
+
+    async def edit_message(self, content=None, *, view=None, **kwargs) -> None:
+        await self._respond(content, view)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def send(self, content=None, *, view=None, file=None, ephemeral: bool = False, **kwargs):
+        # Webhook followups don't share the channel bucket
+        await self.interaction.gateway.request()
+        return self.interaction.gateway.record("followup", self.interaction.channel_id, content, view, file)
+
+
+class FakeInteraction:
+    """
+    The parts of discord.Interaction the cogs use. responded_at is the
+    perf_counter time of the first response, e.g. a defer.
+    """
+
+    def __init__(self, gateway: FakeGateway, user_id: int, channel: FakeChannel):
+        self.gateway = gateway
+        self.user = FakeUser(user_id)
+        self.channel = channel
+        self.channel_id = channel.id
+        self.guild_id = channel.guild_id
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(self)
+        self.responded_at: Optional[float] = None
+
+
+class FakeBot:
+    """
+    Just enough of commands.Bot to run the cogs: channels of every guild,
+    and wait_until_ready, released by ready().
+    """
+
+    def __init__(self, gateway: FakeGateway, guilds: int, channels_per_guild: int = 2):
+        self.gateway = gateway
+        self.channels: dict[int, FakeChannel] = {}
+        for guild_id in range(1, guilds + 1):
+            for i in range(channels_per_guild):
+                channel_id = guild_id * 1000 + i
+                self.channels[channel_id] = FakeChannel(gateway, channel_id, guild_id)
+        self._ready = asyncio.Event()
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+    def ready(self) -> None:
+        self._ready.set()
+
+    async def wait_until_ready(self) -> None:
+        await self._ready.wait()
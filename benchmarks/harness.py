@@ -0,0 +1,142 @@
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Optional
+import json
+import time
+
+
+class FakeClock:
+    """
+    Manually advanced clock, returns epoch seconds like time.time.
+    """
+
+    def __init__(self, now: float = 1_750_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@dataclass
+class Result:
+    name: str
+    runs: int
+    ops_per_second: float
+    p50_us: float
+    p99_us: float
+
+    def format(self) -> str:
+        return (
+            f"{self.name:<48} {self.runs:>8} runs {self.ops_per_second:>14,.1f} ops/s"
+            f" p50 {self.p50_us:>12,.1f} us p99 {self.p99_us:>12,.1f} us"
+        )
+
+
+def _percentile(sorted_samples: list[int], fraction: float) -> float:
+    index = min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))
+    return sorted_samples[index] / 1000
+
+
+def summarize(name: str, samples: list[int]) -> Result:
+    """
+    Result of a list of durations in nanoseconds.
+    """
+    samples.sort()
+    total = sum(samples)
+    return Result(
+        name=name,
+        runs=len(samples),
+        ops_per_second=len(samples) / (total / 1e9) if total else float("inf"),
+        p50_us=_percentile(samples, 0.50),
+        p99_us=_percentile(samples, 0.99),
+    )
+
+
+class Runner:
+    """
+    Times benchmark operations one call at a time and keeps the results.
+    setup runs before every call and is not timed.
+    """
+
+    def __init__(self, name_filter: Optional[str] = None, scale: float = 1.0):
+        self.name_filter = name_filter
+        self.scale = scale
+        self.results: list[Result] = []
+
+    def enabled(self, name: str) -> bool:
+        return self.name_filter is None or self.name_filter in name
+
+    def _runs(self, runs: int) -> int:
+        return max(1, int(runs * self.scale))
+
+    def measure(self, name: str, operation: Callable[[], object], runs: int,
+                setup: Optional[Callable[[], object]] = None) -> Optional[Result]:
+        if not self.enabled(name):
+            return None
+
+        samples = []
+        for _ in range(self._runs(runs)):
+            if setup is not None:
+                setup()
+            start = time.perf_counter_ns()
+            operation()
+            samples.append(time.perf_counter_ns() - start)
+        return self._record(name, samples)
+
+    async def measure_async(self, name: str, operation: Callable[[], Awaitable[object]], runs: int,
+                            setup: Optional[Callable[[], Awaitable[object]]] = None) -> Optional[Result]:
+        if not self.enabled(name):
+            return None
+
+        samples = []
+        for _ in range(self._runs(runs)):
+            if setup is not None:
+                await setup()
+            start = time.perf_counter_ns()
+            await operation()
+            samples.append(time.perf_counter_ns() - start)
+        return self._record(name, samples)
+
+    def _record(self, name: str, samples: list[int]) -> Result:
+        result = summarize(name, samples)
+        self.results.append(result)
+        print(result.format(), flush=True)
+        return result
+
+
+def save_baseline(path: str, results: list[Result]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({result.name: asdict(result) for result in results}, f, indent=2)
+
+
+def compare_baseline(path: str, results: list[Result], threshold: float) -> list[str]:
+    """
+    Print the p50 / p99 change of every result against a saved baseline.
+
+    :param threshold: Relative p50 slowdown above which a result is a regression, 0.1 is 10%.
+    :return: The names of the regressed benchmarks.
+    """
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    print(f"\nCompared to {path}:")
+    for result in results:
+        before = baseline.get(result.name)
+        if before is None:
+            print(f"{result.name:<48} new")
+            continue
+
+        p50_change = result.p50_us / before["p50_us"] - 1 if before["p50_us"] else 0.0
+        p99_change = result.p99_us / before["p99_us"] - 1 if before["p99_us"] else 0.0
+        regressed = p50_change > threshold
+        if regressed:
+            regressions.append(result.name)
+        print(
+            f"{result.name:<48} p50 {p50_change:>+8.1%} p99 {p99_change:>+8.1%}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+
+    return regressions
@@ -0,0 +1,217 @@
+from benchmarks.fixtures import FixtureHttpClient, keystrokes, map_fixture, synthetic_alerts
+from benchmarks.gateway import FakeBot, FakeGateway, FakeInteraction
+from benchmarks.harness import FakeClock, summarize
+from cogs.garland import GarlandCog
+from cogs.reminders import ReminderCog
+from services.gt_reminder_service import GtAlertService
+from services.reminder_service import ReminderService
+from services.timezone_service import TimezoneService
+from storage import SQLiteStorage
+from utils.alert_scheduler import AlertScheduler
+from utils.dispatcher import Dispatcher
+from utils.et_time import ET_DAY_SECONDS, ET_MULTIPLIER
+from utils.map_cache import MapCache
+from utils.render_pool import RenderPool
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: dict[str, list[int]] = {}
+        self.errors: dict[str, int] = {}
+        self.loop_lag: list[int] = []
+
+    def record(self, command: str, started: float, finished: float) -> None:
+        self.latencies.setdefault(command, []).append(int((finished - started) * 1e9))
+
+    def error(self, command: str) -> None:
+        self.errors[command] = self.errors.get(command, 0) + 1
+
+
+async def monitor_loop_lag(stats: LoadStats, interval: float = 0.01) -> None:
+    """
+    How late the event loop wakes up a sleeping task, a direct measure of
+    how long callbacks block it.
+    """
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stats.loop_lag.append(max(0, int((time.perf_counter() - expected) * 1e9)))
+
+
+async def invoke(stats: LoadStats, name: str, command, *args, **kwargs) -> None:
+    started = time.perf_counter()
+    try:
+        await command(*args, **kwargs)
+    except Exception as e:
+        logging.error(f"{name} failed: {e}")
+        stats.error(name)
+        return
+    stats.record(name, started, time.perf_counter())
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    stats = LoadStats()
+    gateway = FakeGateway(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        channel_rate=args.channel_rate,
+        global_rate=args.global_rate,
+        raise_on_429=args.raise_on_429,
+        seed=args.seed,
+    )
+    bot = FakeBot(gateway, args.guilds)
+    channels = list(bot.channels.values())
+    storage = SQLiteStorage(":memory:")
+    timezone_service = TimezoneService(storage.timezones)
+    reminder_service = ReminderService(storage.reminders)
+    clock = FakeClock(time.time())
+    work_dir = tempfile.mkdtemp(prefix="panda_load_")
+    render_pool = RenderPool(max_workers=args.render_workers)
+    # The alert waves jump the clock by hours, nothing may expire meanwhile
+    dispatcher = Dispatcher(workers=args.notify_workers, clock=lambda: 0.0)
+
+    garland = GarlandCog(
+        bot,
+        GtAlertService(storage.alerts),
+        timezone_service,
+        map_cache=MapCache(),
+        render_pool=render_pool,
+        http_client=FixtureHttpClient(map_fixture(work_dir)),
+        alert_scheduler=AlertScheduler(clock.time),
+        dispatcher=dispatcher,
+    )
+    reminders = ReminderCog(bot, timezone_service, reminder_service, dispatcher)
+    items = list(garland.catalog.items)
+
+    print(f"Seeding {args.alerts} alerts over {len(channels)} channels...")
+    with storage.transaction():
+        for alert in synthetic_alerts(items, args.alerts, list(bot.channels), args.seed):
+            garland.gt_reminder_service.create_alert(alert)
+        for user_id in range(1, args.users + 1):
+            timezone_service.set_user_timezone(user_id, "Europe/Paris")
+
+    lag_monitor = asyncio.create_task(monitor_loop_lag(stats))
+    bot.ready()
+    # Let the cog loops load their queues
+    await asyncio.sleep(0.5)
+
+    def interaction() -> FakeInteraction:
+        return FakeInteraction(gateway, rng.randrange(1, args.users + 1), rng.choice(channels))
+
+    async def gather_once():
+        sequence = rng.choice(typed)
+        for text in sequence[:min(len(sequence), 4)]:
+            await invoke(stats, "autocomplete", garland.gathering_node_autocomplete, interaction(), text)
+        item = rng.choice(items)
+        gather_interaction = interaction()
+        started = time.perf_counter()
+        await invoke(stats, "/gather", garland.gather.callback, garland, gather_interaction, str(item.id))
+        if gather_interaction.responded_at is not None:
+            stats.record("/gather (first)", started, gather_interaction.responded_at)
+
+    async def remindme_once():
+        delay = rng.uniform(1, args.duration)
+        await invoke(
+            stats, "/remindme", reminders.remindme.callback, reminders, interaction(),
+            f"in {int(delay)} seconds", "load test reminder", False,
+        )
+
+    async def alert_waves():
+        # Each wave makes a slice of the ET day pass, over the run every alert fires once
+        wave_seconds = ET_DAY_SECONDS / ET_MULTIPLIER / args.alert_waves
+        for _ in range(args.alert_waves):
+            await asyncio.sleep(args.duration / args.alert_waves)
+            clock.advance(wave_seconds)
+            garland.alert_scheduler.queue.wake()
+
+    typed = keystrokes(items, words=100, seed=args.seed)
+    started = time.perf_counter()
+    sent_before = len(gateway.sent)
+    tasks = [asyncio.create_task(alert_waves())]
+
+    # Open loop arrivals, commands don't wait for each other
+    deadline = started + args.duration
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(rng.expovariate(args.gather_rate + args.remindme_rate))
+        if rng.random() < args.gather_rate / (args.gather_rate + args.remindme_rate):
+            tasks.append(asyncio.create_task(gather_once()))
+        else:
+            tasks.append(asyncio.create_task(remindme_once()))
+
+    await asyncio.gather(*tasks)
+    # Reminders due at the end of the run, and the notifications still queued
+    await asyncio.sleep(2)
+    await dispatcher.join()
+    elapsed = time.perf_counter() - started
+
+    lag_monitor.cancel()
+    garland.cog_unload()
+    reminders.cog_unload()
+    dispatcher.close()
+    render_pool.close()
+    storage.close()
+
+    report(stats, gateway, elapsed, len(gateway.sent) - sent_before)
+
+
+def report(stats: LoadStats, gateway: FakeGateway, elapsed: float, messages: int) -> None:
+    print(f"\n{'command':<16} {'count':>8} {'errors':>8} {'p50 ms':>10} {'p99 ms':>10}")
+    for command, samples in sorted(stats.latencies.items()):
+        result = summarize(command, samples)
+        print(
+            f"{command:<16} {result.runs:>8} {stats.errors.get(command, 0):>8}"
+            f" {result.p50_us / 1000:>10.1f} {result.p99_us / 1000:>10.1f}"
+        )
+
+    if stats.loop_lag:
+        lag = summarize("loop lag", stats.loop_lag)
+        print(
+            f"\nevent loop lag   p50 {lag.p50_us / 1000:.1f} ms  p99 {lag.p99_us / 1000:.1f} ms"
+            f"  max {max(stats.loop_lag) / 1e6:.1f} ms"
+        )
+
+    by_kind: dict[str, int] = {}
+    for message in gateway.sent:
+        by_kind[message.kind] = by_kind.get(message.kind, 0) + 1
+    print(f"messages         {messages} in {elapsed:.1f} s, {messages / elapsed:.1f}/s {by_kind}")
+    print(f"api requests     {gateway.requests}, {gateway.rate_limited} rate limited (429)")
+    uploads = sum(1 for message in gateway.sent if message.attachments)
+    print(f"map uploads      {uploads}, {gateway.uploaded_bytes / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the real cogs through a fake Discord gateway")
+    parser.add_argument("--guilds", type=int, default=500)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--alerts", type=int, default=5000)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of scripted load")
+    parser.add_argument("--gather-rate", type=float, default=20.0, help="/gather per second")
+    parser.add_argument("--remindme-rate", type=float, default=2.0, help="/remindme per second")
+    parser.add_argument("--alert-waves", type=int, default=4, help="alert bursts during the run")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="simulated API round trip")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--channel-rate", type=float, default=1.0, help="messages per second per channel")
+    parser.add_argument("--global-rate", type=float, default=50.0, help="API requests per second")
+    parser.add_argument("--raise-on-429", action="store_true", help="surface 429s instead of waiting them out")
+    parser.add_argument("--render-workers", type=int, default=2)
+    parser.add_argument("--notify-workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # The catalog and the assets are loaded relative to the repository root
+    os.chdir(BASE_DIR)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+from benchmarks.fixtures import FixtureHttpClient, keystrokes, map_fixture, synthetic_alerts
+from benchmarks.gateway import FakeBot, FakeGateway
+from benchmarks.harness import FakeClock, Runner
+from cogs.garland import GarlandCog
+from services.gt_reminder_service import GtAlertService
+from services.timezone_service import TimezoneService
+from storage import SQLiteStorage
+from utils.alert_scheduler import AlertScheduler
+from utils.compiled_catalog import write_compiled_catalog
+from utils.dispatcher import Dispatcher
+from utils.et_time import ET_DAY_SECONDS, ET_MULTIPLIER, EorzeaClock, _check_active, convert, should_notify
+from utils.garland_tools import GATHERING_ITEMS_PATH, load_compiled_catalog, load_gathering_items
+from utils.map_cache import MapCache
+from utils.map_render import map_style, render_zone_map
+from utils.render_pool import RenderPool
+from zoneinfo import ZoneInfo
+import itertools
+import json
+import os
+
+USER_TIMEZONE = ZoneInfo("Europe/Paris")
+# Spread the synthetic alerts over 1000 channels
+GUILDS = 500
+# Real seconds in one ET day
+ET_DAY_REAL_SECONDS = ET_DAY_SECONDS / ET_MULTIPLIER
+
+
+def _make_cog(clock: FakeClock, storage: SQLiteStorage, map_file: str, render_pool: RenderPool) -> GarlandCog:
+    # No latency nor rate limits, the benchmarks only time the bot side
+    bot = FakeBot(FakeGateway(latency=0, channel_rate=None, global_rate=None), GUILDS)
+    # Every alert of the ET day is sent at once, none may count as expired
+    dispatcher = Dispatcher(channel_rate=None, global_rate=None, clock=lambda: 0.0)
+    return GarlandCog(
+        bot,
+        GtAlertService(storage.alerts),
+        TimezoneService(storage.timezones),
+        map_cache=MapCache(),
+        render_pool=render_pool,
+        http_client=FixtureHttpClient(map_file),
+        alert_scheduler=AlertScheduler(clock.time),
+        dispatcher=dispatcher,
+    )
+
+
+def bench_et_time(runner: Runner) -> None:
+    fake_clock = FakeClock()
+    clock = EorzeaClock(fake_clock.time)
+    catalog = load_gathering_items()
+    nodes = itertools.cycle([item.node for item in catalog.items])
+    alerts = itertools.cycle(synthetic_alerts(catalog.items, 1000, [1]))
+
+    def tick():
+        # A different ET time on every call, so nothing is served from a cache by accident
+        fake_clock.advance(7.3)
+
+    node = next(nodes)
+
+    def next_node():
+        nonlocal node
+        tick()
+        node = next(nodes)
+
+    runner.measure(
+        "et_time.convert", lambda: convert(node.time, node.node_duration, USER_TIMEZONE, clock),
+        runs=20_000, setup=next_node,
+    )
+    runner.measure(
+        "et_time._check_active", lambda: _check_active(node.time, node.node_duration, clock),
+        runs=20_000, setup=next_node,
+    )
+
+    alert = next(alerts)
+
+    def next_alert():
+        nonlocal alert
+        tick()
+        alert = next(alerts)
+
+    runner.measure(
+        "et_time.should_notify", lambda: should_notify(alert, USER_TIMEZONE, clock),
+        runs=20_000, setup=next_alert,
+    )
+
+    timeline = catalog.timeline
+    items = itertools.cycle(catalog.items)
+    item = next(items)
+
+    def next_item():
+        nonlocal item
+        item = next(items)
+
+    runner.measure(
+        "spawn_timeline.convert (cached)", lambda: timeline.convert(item, USER_TIMEZONE),
+        runs=20_000, setup=next_item,
+    )
+
+
+def bench_catalog(runner: Runner, work_dir: str) -> None:
+    runner.measure("load_gathering_items", load_gathering_items, runs=30)
+
+    compiled_path = os.path.join(work_dir, "gathering_items.bin")
+    with open(GATHERING_ITEMS_PATH, encoding="utf-8") as f:
+        write_compiled_catalog(compiled_path, json.load(f))
+    runner.measure("load_compiled_catalog", lambda: load_compiled_catalog(compiled_path), runs=30)
+
+
+def bench_map_render(runner: Runner, work_dir: str) -> None:
+    map_file = map_fixture(work_dir)
+    items = itertools.cycle(load_gathering_items().items)
+    styles = [
+        map_style(),
+        map_style("webp"),
+        map_style("jpeg", crop=768, max_size=768),
+        map_style("webp", crop=768, max_size=768),
+        map_style("avif", crop=768, max_size=768),
+    ]
+    for style in styles:
+        name = f"render_zone_map ({style.key})"
+        if not runner.enabled(name):
+            continue
+        item = next(items)
+        sizes = []
+
+        def next_item():
+            nonlocal item
+            item = next(items)
+
+        def render():
+            coordinates = item.node.coordinates
+            sizes.append(len(render_zone_map(map_file, (coordinates[0], coordinates[1]), item.zone, style)))
+
+        # Decodes and downscales the base map once, like a warm render worker
+        render()
+        runner.measure(name, render, runs=30, setup=next_item)
+        print(f"  {style.filename} payload {sum(sizes) / len(sizes) / 1024:.0f} KiB on average")
+
+
+async def bench_cog(runner: Runner, work_dir: str, sizes: list[int]) -> None:
+    map_file = map_fixture(work_dir)
+    render_pool = RenderPool(max_workers=1)
+    try:
+        await _bench_autocomplete(runner, map_file, render_pool)
+        await _bench_zone_map(runner, map_file, render_pool)
+        for size in sizes:
+            await _bench_reminder_tick(runner, map_file, render_pool, size)
+    finally:
+        render_pool.close()
+
+
+async def _bench_autocomplete(runner: Runner, map_file: str, render_pool: RenderPool) -> None:
+    storage = SQLiteStorage(":memory:")
+    cog = _make_cog(FakeClock(), storage, map_file, render_pool)
+    try:
+        index = cog.catalog.search_index
+        typed = [text for sequence in keystrokes(cog.catalog.items) for text in sequence]
+        texts = itertools.cycle(typed)
+        text = next(texts)
+
+        def next_text():
+            nonlocal text
+            text = next(texts)
+
+        def next_text_cold():
+            next_text()
+            index._cache.clear()
+            index._similar_cache.clear()
+
+        async def autocomplete():
+            await cog.gathering_node_autocomplete(None, text)
+
+        async def setup_cold():
+            next_text_cold()
+
+        await runner.measure_async("autocomplete keystroke (cold cache)", autocomplete, runs=len(typed), setup=setup_cold)
+
+        # As many distinct queries as the cache holds, primed by a first untimed pass
+        warm_texts = list(dict.fromkeys(typed))[:index.cache_size]
+        for text in warm_texts:
+            await cog.gathering_node_autocomplete(None, text)
+        warm = itertools.cycle(warm_texts)
+
+        async def setup_warm():
+            nonlocal text
+            text = next(warm)
+
+        await runner.measure_async(
+            "autocomplete keystroke (warm cache)", autocomplete, runs=len(warm_texts), setup=setup_warm
+        )
+    finally:
+        cog.cog_unload()
+        cog.dispatcher.close()
+        storage.close()
+
+
+async def _bench_zone_map(runner: Runner, map_file: str, render_pool: RenderPool) -> None:
+    storage = SQLiteStorage(":memory:")
+    cog = _make_cog(FakeClock(), storage, map_file, render_pool)
+    try:
+        items = itertools.cycle(cog.catalog.items)
+        item = next(items)
+
+        # Starts the worker process and decodes the base map once
+        await cog.get_zone_map(item)
+
+        async def next_item_cold():
+            nonlocal item
+            item = next(items)
+            cog.map_cache.clear()
+
+        await runner.measure_async("get_zone_map (render)", lambda: cog.get_zone_map(item), runs=20, setup=next_item_cold)
+        await runner.measure_async("get_zone_map (cached)", lambda: cog.get_zone_map(item), runs=2_000)
+    finally:
+        cog.cog_unload()
+        cog.dispatcher.close()
+        storage.close()
+
+
+async def _bench_reminder_tick(runner: Runner, map_file: str, render_pool: RenderPool, size: int) -> None:
+    name = f"reminder_loop tick ({size:,} alerts)"
+    if not runner.enabled(name):
+        return
+
+    clock = FakeClock()
+    storage = SQLiteStorage(":memory:")
+    cog = _make_cog(clock, storage, map_file, render_pool)
+    try:
+        alerts = synthetic_alerts(cog.catalog.items, size, list(cog.bot.channels))
+        with storage.transaction():
+            for alert in alerts:
+                cog.gt_reminder_service.create_alert(alert)
+
+        # The renders are measured by get_zone_map, keep them out of the tick
+        for item in cog.catalog.items:
+            cog.map_cache.renders.put(cog._map_key(item), b"\xff" * 60_000)
+
+        async def every_alert_due():
+            clock.now = FakeClock().now
+            cog.alert_scheduler.load(alerts)
+            clock.advance(ET_DAY_REAL_SECONDS)
+
+        async def tick():
+            # Queued by the loop, then rendered and sent by the dispatcher
+            await cog.reminder_loop.coro(cog)
+            await cog.dispatcher.join()
+
+        runs = 5 if size <= 1_000 else 3 if size <= 10_000 else 1
+        await runner.measure_async(name, tick, runs=runs, setup=every_alert_due)
+    finally:
+        cog.cog_unload()
+        cog.dispatcher.close()
+        storage.close()
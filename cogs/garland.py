@@ -2,26 +2,58 @@ from zoneinfo import ZoneInfo
 from discord.ext import commands, tasks
 from discord import app_commands
 from models import GatheringReminder, GatheringItem
-from urllib.parse import quote
-from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
+from typing import Callable
 from services.gt_reminder_service import GtAlertService
-from services.timezone_service import TimezoneService
-from utils.et_time import convert, format_et_hours, should_notify
-from utils.garland_tools import load_gathering_items
-import requests
+from services.timezone_service import TimezoneService, DEFAULT_ZONE_INFO
+from utils.alert_scheduler import AlertScheduler
+from utils.attachment_urls import AttachmentUrls
+from utils.dispatcher import Dispatcher, Notification
+from utils.et_time import ET_MULTIPLIER, convert, format_et_hours
+from utils.garland_tools import GatheringCatalog, catalog_mtimes, load_catalog, zone_map_path
+from utils.http_client import HttpClient, HttpError
+from utils.logging_config import new_correlation_id
+from utils.map_bundle import MapBundle
+from utils.map_cache import MapCache, render_key
+from utils.map_render import MapStyle
+from utils.metrics import CACHE_REQUESTS, REGISTRY
+from utils.render_pool import RenderPool
+from utils.sharding import ShardOwnership
+from utils.spawn_timeline import SpawnTimeline
+import asyncio
+import dataclasses
 import discord
+import functools
+import logging
 import os
+import time
 
+# Raw maps are revalidated against garlandtools.org once a day
+MAP_MAX_AGE = 24 * 60 * 60
 
-def ffxiv_to_pixels(x, y, map_size=2048):
+# Seconds between two checks of the catalog files by the watcher
+CATALOG_WATCH_INTERVAL = 30
 
-    scale = map_size / 45
+# Keeps /upcoming under the message length limit
+UPCOMING_MAX_LINES = 8
 
-    pixel_x = (x * scale) - 8.0
-    pixel_y = (y * scale) + 18.0
+# Real seconds in an ET hour, alerts are dropped once the spawn window closed
+ET_HOUR_REAL_SECONDS = 3600 / ET_MULTIPLIER
 
-    return int(pixel_x), int(pixel_y)
+TICK_SECONDS = REGISTRY.histogram("pandabot_reminder_loop_tick_seconds", "reminder_loop ticks, from wake up to the last alert queued")
+TICK_OVERRUNS = REGISTRY.counter(
+    "pandabot_reminder_loop_overruns", "reminder_loop ticks that ended after the next alert was already due"
+)
+ALERTS_EVALUATED = REGISTRY.counter("pandabot_alerts_evaluated", "Alerts taken due from the scheduler")
+ALERTS_FIRED = REGISTRY.counter("pandabot_alerts_fired", "Alerts notified in a channel")
+ALERTS_SCHEDULED = REGISTRY.gauge("pandabot_alerts_scheduled", "Enabled alerts waiting in the scheduler")
+ALERT_DELAY = REGISTRY.histogram(
+    "pandabot_alert_delay_seconds", "Time between an alert being due and its message being sent",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+MAP_FETCH_SECONDS = REGISTRY.histogram(
+    "pandabot_map_fetch_seconds", "Getting a raw zone map file, served from the HTTP cache or fetched"
+)
 
 
 def _build_alert_text(reminder: GatheringReminder) -> str:
@@ -36,7 +68,7 @@ def _build_alert_text(reminder: GatheringReminder) -> str:
     return "\n".join(lines)
 
 class ToggleButton(discord.ui.Button["AlertsView"]):
-    def __init__(self, doc_id: int, is_enabled: bool) -> None:
+    def __init__(self, doc_id: int | None, is_enabled: bool) -> None:
         super().__init__(
             label="⏸ Pause" if is_enabled else "▶ Resume",
             style=discord.ButtonStyle.secondary,# noqa
@@ -45,11 +77,14 @@ class ToggleButton(discord.ui.Button["AlertsView"]):
         self.doc_id = doc_id
 
     async def callback(self, interaction: discord.Interaction) -> None:
+        if self.doc_id is None:
+            await self.view._update_user_alert(interaction, remove=False)# noqa
+            return
         await self.view.gt_alert_service.toggle_reminder(self.doc_id)
         await self.view._refresh(interaction)# noqa
 
 class RemoveButton(discord.ui.Button):
-    def __init__(self, doc_id: int) -> None:
+    def __init__(self, doc_id: int | None) -> None:
         super().__init__(
             label="🗑 Remove",
             style=discord.ButtonStyle.danger,# noqa
@@ -58,6 +93,9 @@ class RemoveButton(discord.ui.Button):
         self.doc_id = doc_id
 
     async def callback(self, interaction: discord.Interaction) -> None:
+        if self.doc_id is None:
+            await self.view._update_user_alert(interaction, remove=True)# noqa
+            return
         await self.view.gt_alert_service.delete_reminder(self.doc_id)
         if type(self.parent) != AlertActionRow:
             self.view.gathering_item.alert = None
@@ -99,14 +137,20 @@ class ReminderView(discord.ui.LayoutView):
     def __init__(
             self,
             user_id: int,
-            user_timezone: str,
+            user_timezone: ZoneInfo,
             gathering_item: GatheringItem,
             gt_alert_service: GtAlertService,
             alert_mode: bool,
             timeout: float = 120.0,
+            mention_user_ids: list[int] | None = None,
+            spawn_timeline: SpawnTimeline | None = None,
+            map_url: str = "attachment://map.jpg",
     ) -> None:
         super().__init__(timeout=timeout)
         self.user_id = user_id
+        self.map_url = map_url
+        self.spawn_timeline = spawn_timeline
+        self.mention_user_ids = mention_user_ids or [user_id]
         self.gathering_item = gathering_item
         self.user_timezone = user_timezone
         self.gt_alert_service = gt_alert_service
@@ -124,7 +168,10 @@ class ReminderView(discord.ui.LayoutView):
         icon_url = f"https://www.garlandtools.org/files/icons/item/{gathering_item.icon_id}.png"
         gathering_node = gathering_item.node
         alert = gathering_item.alert
-        next_occurrence, remaining = convert(gathering_node.time, gathering_node.node_duration, ZoneInfo(user_timezone))
+        if self.spawn_timeline is not None:
+            next_occurrence, remaining = self.spawn_timeline.convert(gathering_item, user_timezone)
+        else:
+            next_occurrence, remaining = convert(gathering_node.time, gathering_node.node_duration, user_timezone)
 
         if next_occurrence == "Currently active":
             spawn_text = f"**Status**: 🟢 Active — closes in {remaining}"
@@ -154,9 +201,10 @@ class ReminderView(discord.ui.LayoutView):
         )
 
         if alert_mode:
+            mentions = " ".join(f"<@{mention_user_id}>" for mention_user_id in self.mention_user_ids)
             title_section.add_item(
                 discord.ui.TextDisplay(
-                    content=f"<@{user_id}> ⏰ Your node is spawning soon!"
+                    content=f"{mentions} ⏰ Your node is spawning soon!"
                 )
             )
 
@@ -164,14 +212,22 @@ class ReminderView(discord.ui.LayoutView):
             title_section,
             discord.ui.MediaGallery(
                 discord.MediaGalleryItem(
-                    media="attachment://map.jpg"
+                    media=self.map_url
                 )
             ),
             accent_colour=discord.Colour.orange()
         )
         action_row = discord.ui.ActionRow()
 
-        if alert:
+        if alert_mode and len(self.mention_user_ids) > 1:
+            # Shared alert message, the buttons act on the alert of whoever clicks
+            action_row.add_item(
+                ToggleButton(None, True)
+            )
+            action_row.add_item(
+                RemoveButton(None)
+            )
+        elif alert:
             action_row.add_item(
                 ToggleButton(alert.doc_id, alert.enable)
             )
@@ -193,6 +249,22 @@ class ReminderView(discord.ui.LayoutView):
         self._build(self.gathering_item, self.user_id, self.user_timezone, self.alert_mode)
         await interaction.response.edit_message(view=self)# noqa
 
+    async def _update_user_alert(self, interaction: discord.Interaction, remove: bool) -> None:
+        alert = self.gt_alert_service.get_item_alert_for_user(interaction.user.id, self.gathering_item.id)
+        if alert is None:
+            await interaction.response.send_message("You have no alert for this item.", ephemeral=True)# noqa
+            return
+
+        if remove:
+            await self.gt_alert_service.delete_reminder(alert.doc_id)
+            message = f":no_bell:  Alerts off for {self.gathering_item.name}"
+        else:
+            alert = await self.gt_alert_service.toggle_reminder(alert.doc_id)
+            state = "resumed" if alert.enable else "paused"
+            message = f"Alerts {state} for {self.gathering_item.name}"
+
+        await interaction.response.send_message(message, ephemeral=True)# noqa
+
 class AlertsView(discord.ui.LayoutView):
     def __init__(
         self,
@@ -237,68 +309,292 @@ class AlertsView(discord.ui.LayoutView):
         await interaction.response.edit_message(view=self)# noqa
 
 class GarlandCog(commands.Cog):
-    def __init__(self, bot, gt_reminder_service: GtAlertService, timezone_service: TimezoneService):
+    def __init__(
+            self,
+            bot,
+            gt_reminder_service: GtAlertService,
+            timezone_service: TimezoneService,
+            map_cache: MapCache | None = None,
+            render_pool: RenderPool | None = None,
+            http_client: HttpClient | None = None,
+            map_bundle: MapBundle | None = None,
+            watch_catalog: bool = False,
+            alert_scheduler: AlertScheduler | None = None,
+            dispatcher: Dispatcher | None = None,
+            attachment_urls: AttachmentUrls | None = None,
+            map_style: MapStyle | None = None):
         self.bot = bot
         self.gt_reminder_service = gt_reminder_service
         self.timezone_service = timezone_service
+        self.map_cache = map_cache or MapCache()
+        self.render_pool = render_pool or RenderPool()
+        self.http_client = http_client or HttpClient()
+        self.map_bundle = map_bundle
+        # AlertScheduler has a length, an empty one is falsy
+        self.alert_scheduler = alert_scheduler if alert_scheduler is not None else AlertScheduler()
+        # Usually shared with the other cogs, closed by whoever created it
+        self._owns_dispatcher = dispatcher is None
+        self.dispatcher = dispatcher if dispatcher is not None else Dispatcher()
+        # AttachmentUrls has a length, an empty one is falsy
+        self.attachment_urls = attachment_urls if attachment_urls is not None else AttachmentUrls()
+        self.map_style = map_style or MapStyle()
+        # Sent alerts waiting for their last notification update, see _record_notified
+        self._notified: list[tuple[int, ZoneInfo]] = []
+        self.shards = ShardOwnership(bot)
+        self.gt_reminder_service.add_listener(self.alert_changed)
+        ALERTS_SCHEDULED.set_function(lambda: len(self.alert_scheduler))
         self.reminder_loop.start()
-        self.gathering_items, self.gathering_items_by_id = load_gathering_items()
+        # Swapped as a whole on reload, handlers read it once and keep that snapshot
+        self.catalog = load_catalog()
+        self._catalog_mtimes = catalog_mtimes()
+        self._reload_lock = asyncio.Lock()
+        if watch_catalog:
+            self.catalog_watcher.start()
         self.BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
     def cog_unload(self) -> None:
+        self._flush_notified()
         self.reminder_loop.cancel()
+        self.catalog_watcher.cancel()
+        if self._owns_dispatcher:
+            self.dispatcher.close()
+        self.gt_reminder_service.remove_listener(self.alert_changed)
+
+    def alert_changed(self, doc_id: int, alert: GatheringReminder | None) -> None:
+        """
+        GtAlertService listener. Alerts of channels served by another shard
+        process are left to it.
+        """
+        if alert is not None and not self.shards.owns_channel(alert.channel_id):
+            alert = None
+        self.alert_scheduler.alert_changed(doc_id, alert)
+
+    def refresh_alerts(self, doc_ids: list[int] | None = None) -> None:
+        """
+        Re-read alerts written by another process sharing the storage, e.g.
+        paused with /alerts from a guild of another shard.
+
+        :param doc_ids: The changed alerts, None reloads them all.
+        """
+        if doc_ids is None:
+            self._load_alerts()
+            return
+
+        for doc_id in doc_ids:
+            self.alert_changed(doc_id, self.gt_reminder_service.get_alert(doc_id))
+
+    def _load_alerts(self) -> None:
+        self.alert_scheduler.load([
+            alert for alert in self.gt_reminder_service.get_all_enabled()
+            if self.shards.owns_channel(alert.channel_id)
+        ])
+
+    async def reload_catalog(self) -> GatheringCatalog:
+        """
+        Load the catalog files again and swap the new catalog in.
+        Parsing and indexing run in a thread so the event loop keeps serving.
+        """
+        async with self._reload_lock:
+            mtimes = catalog_mtimes()
+            catalog = await asyncio.to_thread(load_catalog)
+            catalog.version = self.catalog.version + 1
+            self.catalog = catalog
+            self._catalog_mtimes = mtimes
+
+        logging.info(f"Gathering catalog reloaded, version {catalog.version} with {len(catalog.items)} items")
+        return catalog
+
+    @tasks.loop(seconds=CATALOG_WATCH_INTERVAL)
+    async def catalog_watcher(self) -> None:
+        if catalog_mtimes() == self._catalog_mtimes:
+            return
+        try:
+            await self.reload_catalog()
+        except (OSError, ValueError, KeyError) as e:
+            # Keep serving the current catalog, a half written file is retried next check
+            logging.error(f"Failed to reload the gathering catalog: {e}")
+
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.command(name="reload_catalog", description="Reload the gathering items without restarting")
+    async def reload_catalog_command(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)# noqa
+        try:
+            catalog = await self.reload_catalog()
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Failed to reload the gathering catalog: {e}")
+            await interaction.followup.send(f"Could not reload the catalog: {e}", ephemeral=True)
+            return
+
+        await interaction.followup.send(
+            f"Catalog reloaded: version {catalog.version}, {len(catalog.items)} items.", ephemeral=True
+        )
 
 
     async def gathering_node_autocomplete(
             self, interaction: discord.Interaction, current: str):
-        user_input = current.lower()
-
-        results = []
-        for node in self.gathering_items:
-            if user_input in node.name_lower:
-                results.append(
-                    app_commands.Choice(
-                        name=node.name,  # displayed to user
-                        value=str(node.id)  # actual returned value
-                    )
-                )
-                if len(results) >= 25:
-                    break
-
-        return results
+        return [
+            app_commands.Choice(
+                name=item.name,  # displayed to user
+                value=str(item.id)  # actual returned value
+            )
+            for item in self.catalog.search_index.search(current, limit=25)
+        ]
 
 
-    @tasks.loop(seconds=30)
+    @tasks.loop()
     async def reminder_loop(self) -> None:
-        alerts = self.gt_reminder_service.get_all_enabled()
-
-
-        for alert in alerts:
-            user_timezone = self.timezone_service.get_user_timezone(alert.user_id)
-            user_zone_info = ZoneInfo(user_timezone)
-            if not should_notify(alert, user_zone_info):
+        await self.alert_scheduler.wait()
+        new_correlation_id("alerts-")
+        started = time.perf_counter()
+
+        # One spawn computation, render and message per node and channel
+        groups: dict[tuple[int, int], list[GatheringReminder]] = {}
+        due_ts: dict[int, float] = {}
+        spawns: dict[tuple[int, int], float] = {}
+        for alert, spawn_ts in self.alert_scheduler.pop_due():
+            key = (alert.item_id, alert.channel_id)
+            groups.setdefault(key, []).append(alert)
+            spawns[key] = min(spawn_ts, spawns.get(key, spawn_ts))
+            due_ts[alert.doc_id] = spawn_ts - alert.alert_before_minutes * 60
+        ALERTS_EVALUATED.inc(len(due_ts))
+
+        # Only queue the messages, the dispatcher renders and sends them
+        catalog = self.catalog
+        for (item_id, channel_id), alerts in groups.items():
+            if self.bot.get_channel(channel_id) is None:
                 continue
 
-            channel = self.bot.get_channel(alert.channel_id)
-            if channel is None:
+            gathering_item = catalog.items_by_id.get(item_id)
+            if gathering_item is None:
+                logging.error(f"Item {item_id} is not in catalog version {catalog.version}, skipping its alerts")
                 continue
 
-            gathering_item = self.gathering_items_by_id[alert.item_id]
-            gathering_item.alert = alert
+            spawn_ts = spawns[(item_id, channel_id)]
+            self.dispatcher.submit(Notification(
+                priority=spawn_ts,
+                channel_id=channel_id,
+                prepare=functools.partial(self._map_media, gathering_item),
+                send=functools.partial(
+                    self._send_alerts, channel_id, gathering_item, alerts, catalog.timeline,
+                    [due_ts[alert.doc_id] for alert in alerts],
+                ),
+                expires_at=spawn_ts + alerts[0].duration_et_hours * ET_HOUR_REAL_SECONDS,
+                description=f"{gathering_item.name} alert in channel {channel_id}",
+            ))
+
+        TICK_SECONDS.observe(time.perf_counter() - started)
+        next_due = self.alert_scheduler.queue.next_due()
+        if next_due is not None and next_due < self.alert_scheduler.clock():
+            TICK_OVERRUNS.inc()
+
+    async def _map_media(self, gathering_item: GatheringItem) -> tuple[str | None, bytes | memoryview | None]:
+        """
+        The map to show with a message: the CDN URL of an earlier upload while it
+        is valid, else the render to upload.
+
+        :return: (url, None) or (None, render)
+        """
+        url = self.attachment_urls.get(self._map_key(gathering_item))
+        if url is not None:
+            return url, None
+        return None, await self.get_zone_map(gathering_item)
+
+    async def _send_with_map(
+            self,
+            send,
+            build_view: Callable[[str], ReminderView],
+            gathering_item: GatheringItem,
+            media: tuple[str | None, bytes | memoryview | None]) -> None:
+        """
+        Send a view showing the map, uploading the render only when no earlier
+        upload can be referenced. The URL of a new upload is remembered.
+
+        :param send: channel.send or a followup send that returns the message.
+        :param build_view: Builds the view for a map URL.
+        :param media: The result of _map_media.
+        """
+        key = self._map_key(gathering_item)
+        url, map_data = media
+        if url is not None:
+            try:
+                await send(view=build_view(url))
+                return
+            except discord.HTTPException as e:
+                if e.status != 400:
+                    raise
+                # The message holding the upload was deleted, upload it again
+                logging.warning(f"Discord refused the map URL of {gathering_item.name}, uploading it: {e}")
+                self.attachment_urls.pop(key)
+                map_data = await self.get_zone_map(gathering_item)
+
+        # The extension follows the format, Discord picks the content type from it.
+        # The only copy of a bundled map, made for the upload
+        filename = self.map_style.filename
+        message = await send(
+            view=build_view(f"attachment://{filename}"),
+            file=discord.File(BytesIO(map_data), filename=filename)
+        )
+        self.attachment_urls.remember(key, message, filename)
 
-            map_output = await self.get_zone_map(gathering_item)
-            view = ReminderView(alert.user_id, user_timezone, gathering_item, self.gt_reminder_service, True)  # noqa
+    async def _send_alerts(
+            self,
+            channel_id: int,
+            gathering_item: GatheringItem,
+            alerts: list[GatheringReminder],
+            spawn_timeline: SpawnTimeline,
+            due_ts: list[float],
+            media: tuple[str | None, bytes | memoryview | None]) -> None:
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            return
 
-            await channel.send(
-                view=view,
-                file=discord.File(map_output, filename="map.jpg")
+        user_ids = [alert.user_id for alert in alerts]
+        user_timezone = self.timezone_service.get_user_zone_info(user_ids[0], DEFAULT_ZONE_INFO)
+        # The catalog items are shared, the view gets its own copy to hold the alert
+        gathering_item = dataclasses.replace(gathering_item, alert=alerts[0])
+
+        def build_view(map_url: str) -> ReminderView:
+            return ReminderView(
+                user_ids[0], user_timezone, gathering_item, self.gt_reminder_service, True,  # noqa
+                mention_user_ids=user_ids, spawn_timeline=spawn_timeline, map_url=map_url
             )
 
-            self.gt_reminder_service.update_last_notification(alert.doc_id, user_zone_info)
+        await self._send_with_map(channel.send, build_view, gathering_item, media)
+
+        # Only once sent, a failed or expired message must not count as notified
+        self._record_notified(alerts)
+
+        sent_ts = self.alert_scheduler.clock()
+        for ts in due_ts:
+            ALERT_DELAY.observe(max(0.0, sent_ts - ts))
+        ALERTS_FIRED.inc(len(alerts))
+
+    def _record_notified(self, alerts: list[GatheringReminder]) -> None:
+        """
+        Queue the last notification update of sent alerts. The sends that complete
+        in the same event loop iteration share one storage write.
+        """
+        if not self._notified:
+            asyncio.get_running_loop().call_soon(self._flush_notified)
+        self._notified.extend(
+            (alert.doc_id, self.timezone_service.get_user_zone_info(alert.user_id, DEFAULT_ZONE_INFO))
+            for alert in alerts
+        )
+
+    def _flush_notified(self) -> None:
+        notified, self._notified = self._notified, []
+        if not notified:
+            return
+        try:
+            self.gt_reminder_service.update_last_notifications(notified)
+        except Exception as e:
+            # Only costs a repeated alert after a restart
+            logging.error(f"Failed to record the last notification of {len(notified)} alerts: {e}")
 
     @reminder_loop.before_loop
     async def before_reminder_loop(self) -> None:
         await self.bot.wait_until_ready()
+        self._load_alerts()
 
     @app_commands.autocomplete(resource=gathering_node_autocomplete)
     @app_commands.command(name="gather", description="Give information on a resource")
@@ -307,132 +603,90 @@ class GarlandCog(commands.Cog):
         await interaction.response.defer()# noqa
 
         selected_id = int(resource)
-        gathering_item = self.gathering_items_by_id[selected_id]
-        gathering_item.alert =  self.gt_reminder_service.get_item_alert_for_user(interaction.user.id, selected_id)
-        user_timezone = self.timezone_service.get_user_timezone(interaction.user.id)
-
-        map_output = await self.get_zone_map(gathering_item)
-        view = ReminderView(interaction.user.id, user_timezone, gathering_item, self.gt_reminder_service, False)  # noqa
-
-        await interaction.followup.send(
-            view=view,
-            file=discord.File(map_output, filename="map.jpg")
+        catalog = self.catalog
+        catalog_item = catalog.items_by_id[selected_id]
+        # The catalog items are shared, the view gets its own copy to hold the alert and description
+        gathering_item = dataclasses.replace(
+            catalog_item,
+            alert=self.gt_reminder_service.get_item_alert_for_user(interaction.user.id, selected_id),
+            description=catalog.describe(catalog_item),
         )
+        user_timezone = self.timezone_service.get_user_zone_info(interaction.user.id, DEFAULT_ZONE_INFO)
 
-    async def get_zone_map(self, gathering_item: GatheringItem) -> BytesIO:
-        gathering_node = gathering_item.node
-        coordinates = gathering_node.coordinates
-        map_url = "https://www.garlandtools.org/files/maps/"f"{quote(gathering_item.map)}.png"
-        response = requests.get(map_url)
-
-        map_image = Image.open(
-            BytesIO(response.content)
-        ).convert("RGBA")
-
-        draw = ImageDraw.Draw(map_image)
-
-        # -----------------------------
-        # Convert coordinates
-        # -----------------------------
-        x, y = ffxiv_to_pixels(coordinates[0], coordinates[1])
+        def build_view(map_url: str) -> ReminderView:
+            return ReminderView(
+                interaction.user.id, user_timezone, gathering_item, self.gt_reminder_service, False,  # noqa
+                spawn_timeline=catalog.timeline, map_url=map_url
+            )
 
-        # -----------------------------
-        # Font (safe fallback)
-        # -----------------------------
-        scale = 3.0
         try:
-            font = ImageFont.truetype(
-                os.path.join(self.BASE_DIR, "assets", "Roboto-Black.ttf"),
-                int(28 * scale)
+            media = await self._map_media(gathering_item)
+            # wait=True, the attachment URL is read from the returned message
+            await self._send_with_map(
+                functools.partial(interaction.followup.send, wait=True), build_view, gathering_item, media
             )
-        except OSError:
-            print("font not found")
-            font = ImageFont.load_default()
-
-        zone_name = gathering_item.zone
-        text_coord = f"{coordinates[0]},{coordinates[1]}"
-
-        # -----------------------------
-        # Text size calculation (correct font!)
-        # -----------------------------
-        bbox = draw.textbbox((0, 0), zone_name, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-
-        bbox_coord = draw.textbbox((0, 0), text_coord, font=font)
-        text_width_coord = bbox_coord[2] - bbox_coord[0]
-        text_height_coord = bbox_coord[3] - bbox_coord[1]
-
-        img_width, img_height = map_image.size
-
-        padding = int(10 * scale)
-
-        box_x1 = 10
-        box_y1 = 10
-        box_x2 = box_x1 + text_width + padding * 2
-        box_y2 = box_y1 + text_height + padding
-
-        box_x2_coord = img_width - 10
-        box_y1_coord = 10
-        box_x1_coord = box_x2_coord - text_width_coord - padding * 2
-        box_y2_coord = box_y1_coord + text_height_coord + padding
-
-        # -----------------------------
-        # Background box (once)
-        # -----------------------------
-        draw.rounded_rectangle(
-            (box_x1, box_y1, box_x2, box_y2),
-            radius=10,
-            fill=(0, 0, 0, 200)
+        except HttpError as e:
+            logging.error(f"Failed to get the map of {gathering_item.name}: {e}")
+            await interaction.followup.send(f"Could not load the map of {gathering_item.name}, try again later.")
+
+    @app_commands.command(name="upcoming", description="List the nodes that are up now or spawn soon")
+    @app_commands.describe(minutes="How far ahead to look, in real minutes")
+    async def upcoming(self, interaction: discord.Interaction, minutes: app_commands.Range[int, 1, 70] = 30):
+        timeline = self.catalog.timeline
+        now_ms = timeline.clock.now_ms()
+        active = timeline.active(now_ms)
+        upcoming = timeline.upcoming(minutes * 60_000, now_ms)
+
+        lines = ["## Up now"]
+        lines.extend(
+            f"**{item.name}** — {item.zone} · closes <t:{end_ms // 1000}:R>"
+            for item, end_ms in active[:UPCOMING_MAX_LINES]
         )
+        if not active:
+            lines.append("Nothing is up right now.")
 
-        draw.rounded_rectangle(
-            (box_x1_coord, box_y1_coord, box_x2_coord, box_y2_coord),
-            radius=10,
-            fill=(0, 0, 0, 200)
+        lines.append(f"## Next {minutes} minutes")
+        lines.extend(
+            f"**{item.name}** — {item.zone} · <t:{spawn_ms // 1000}:t> (<t:{spawn_ms // 1000}:R>)"
+            for item, spawn_ms in upcoming[:UPCOMING_MAX_LINES]
         )
+        if not upcoming:
+            lines.append("Nothing spawns in that time.")
 
-        draw.text(
-            (box_x1_coord + padding, box_y1_coord),
-            f"{coordinates[0]},{coordinates[1]}",
-            font=font,
-            fill=(255, 255, 255, 255)
-        )
+        await interaction.response.send_message("\n".join(lines))# noqa
 
-        # -----------------------------
-        # Text
-        # -----------------------------
-        draw.text(
-            (box_x1 + padding, box_y1),
-            zone_name,
-            font=font,
-            fill=(255, 255, 255, 255)
+    def _map_key(self, gathering_item: GatheringItem) -> str:
+        gathering_node = gathering_item.node
+        return render_key(
+            gathering_node.id, gathering_item.map, gathering_node.coordinates, gathering_item.zone,
+            self.map_style.key,
         )
 
-        # -----------------------------
-        # Node marker (dot)
-        # -----------------------------
-        radius = 35
-
-        draw.ellipse(
-            (
-                x - radius,
-                y - radius,
-                x + radius,
-                y + radius
-            ),
-            fill=(255, 0, 0, 255),
-            outline=(255, 255, 255, 255),
-            width=10
+    async def get_zone_map(self, gathering_item: GatheringItem) -> bytes | memoryview:
+        """
+        The map of a node: a slice of the map bundle when it holds it, else the
+        cached render.
+        """
+        key = self._map_key(gathering_item)
+
+        if self.map_bundle is not None:
+            bundled = self.map_bundle.get(key)
+            CACHE_REQUESTS.labels("map_bundle", "miss" if bundled is None else "hit").inc()
+            if bundled is not None:
+                return bundled
+
+        return await self.map_cache.get_render(
+            key, lambda: self._render_zone_map(gathering_item), self.map_style.extension
         )
 
-        output = BytesIO()
-        map_image.thumbnail((1200, 1200))
-        rgb_image = map_image.convert("RGB")
-        rgb_image.save(output, format="JPEG", output=True)
+    async def _render_zone_map(self, gathering_item: GatheringItem) -> bytes:
+        coordinates = gathering_item.node.coordinates
+        with MAP_FETCH_SECONDS.time():
+            map_file = await self.http_client.get_file(zone_map_path(gathering_item.map), max_age=MAP_MAX_AGE)
 
-        output.seek(0)
-        return output
+        return await self.render_pool.render(
+            map_file, (coordinates[0], coordinates[1]), gathering_item.zone, self.map_style
+        )
 
     @app_commands.autocomplete(resource=gathering_node_autocomplete)
     @app_commands.command(name="notify", description="Enable or disable notification for a resource")
@@ -441,9 +695,9 @@ class GarlandCog(commands.Cog):
 
         selected_id = int(resource)
 
-        gathering_item = self.gathering_items_by_id[selected_id]
+        gathering_item = self.catalog.items_by_id[selected_id]
 
-        gathering_item = self.gathering_items_by_id[selected_id]
+        gathering_item = self.catalog.items_by_id[selected_id]
 
         gathering_item_reminder = GatheringReminder(
             user_id=interaction.user.id,
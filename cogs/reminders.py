@@ -3,16 +3,26 @@ from dateutil.parser import ParserError
 from discord.ext import commands, tasks
 from dateutil import parser as dateutil_parser
 from dateutil.tz import gettz
-from datetime import UTC, tzinfo
+from datetime import UTC, datetime, tzinfo
 from models import Reminder
 from services.reminder_service import ReminderService
 from services.timezone_service import TimezoneService
+from typing import Optional
+from utils.dispatcher import Dispatcher, Notification
+from utils.logging_config import new_correlation_id
+from utils.metrics import REGISTRY
+from utils.scheduler import DueQueue
+from utils.sharding import ShardOwnership
+import asyncio
 import discord
+import functools
 import logging
 import dateparser
 
 D_M_Y_M_H_FORMAT = "%d/%m/%y %H:%M"
 
+REMINDERS_SENT = REGISTRY.counter("pandabot_reminders_sent", "Reminders sent, failures are counted by the dispatcher")
+
 class ReminderDropdown(discord.ui.Select):
     def __init__(self, reminders: list[Reminder]):
         options = []
@@ -56,12 +66,46 @@ class ReminderView(discord.ui.View):
 
 
 class ReminderCog(commands.Cog):
-    def __init__(self, bot, timezone_service: TimezoneService, reminder_service: ReminderService):
+    def __init__(
+            self,
+            bot,
+            timezone_service: TimezoneService,
+            reminder_service: ReminderService,
+            dispatcher: Dispatcher | None = None):
         self.bot = bot
         self.timezone_service = timezone_service
         self.reminder_service = reminder_service
+        self.queue = DueQueue()
+        self.reminders: dict[int, Reminder] = {}
+        self.shards = ShardOwnership(bot)
+        # Usually shared with the other cogs, closed by whoever created it
+        self._owns_dispatcher = dispatcher is None
+        self.dispatcher = dispatcher if dispatcher is not None else Dispatcher()
+        # Sent reminders waiting to be removed or repeated, see _record_sent
+        self._sent: list[Reminder] = []
+        self.reminder_service.add_listener(self.reminder_changed)
         self.check_reminders.start()
 
+    @staticmethod
+    def due_ts(reminder: Reminder) -> float:
+        remind_at = datetime.fromisoformat(reminder.remind_at)
+        if remind_at.tzinfo is None:
+            remind_at = remind_at.replace(tzinfo=UTC)
+        return remind_at.timestamp()
+
+    def reminder_changed(self, doc_id: int, reminder: Optional[Reminder]) -> None:
+        """
+        ReminderService listener, keeps the due queue in sync with the table.
+        Reminders of channels served by another shard process are left to it.
+        """
+        if reminder is None or not self.shards.owns_channel(reminder.channel_id):
+            self.reminders.pop(doc_id, None)
+            self.queue.remove(doc_id)
+            return
+
+        self.reminders[doc_id] = reminder
+        self.queue.schedule(doc_id, self.due_ts(reminder))
+
     @staticmethod
     def parse_datetime_to_utc(time_str: str, user_timezone_str: str):
         """
@@ -148,24 +192,73 @@ class ReminderCog(commands.Cog):
             self.reminder_service.delete_reminder(view.selected_doc_id)
             await interaction.followup.send("Reminder deleted.", ephemeral=True)# noqa
 
-    @tasks.loop(seconds=10)
+    @tasks.loop()
     async def check_reminders(self):
-        reminders = self.reminder_service.get_due_reminders()
+        # Sleeps until the earliest remind_at, or until a reminder is added or removed
+        await self.queue.wait()
+        new_correlation_id("reminders-")
+
+        reminders = [self.reminders[doc_id] for doc_id in self.queue.pop_due() if doc_id in self.reminders]
         for reminder in reminders:
-            channel = self.bot.get_channel(reminder.channel_id)
-            if channel:
-                try:
-                    user = await self.bot.fetch_user(reminder.user_id)
-                    await channel.send(f"{user.mention} ⏰ Reminder: {reminder.message}")
-                except Exception as e:
-                    logging.error(f"Failed to send reminder {reminder.message} for user {reminder.user_id}: {e}")
+            if self.bot.get_channel(reminder.channel_id) is None:
+                # Can't be sent anymore
+                self._record_sent(reminder)
+                continue
+            # Sent by the dispatcher, the loop never waits on Discord
+            self.dispatcher.submit(Notification(
+                priority=self.due_ts(reminder),
+                channel_id=reminder.channel_id,
+                send=functools.partial(self._send_reminder, reminder),
+                description=f"reminder {reminder.doc_id} for user {reminder.user_id}",
+            ))
 
-            if reminder.repeat:
-                self.reminder_service.repeat_reminder(reminder.doc_id)
-            else:
-                # Remove sent reminder
-                self.reminder_service.delete_reminder(reminder.doc_id)
+    async def _send_reminder(self, reminder: Reminder) -> None:
+        channel = self.bot.get_channel(reminder.channel_id)
+        if channel is None:
+            self._record_sent(reminder)
+            return
+        await channel.send(f"<@{reminder.user_id}> ⏰ Reminder: {reminder.message}")
+        REMINDERS_SENT.inc()
+
+        # Only once sent, a failed or expired message must keep its reminder
+        self._record_sent(reminder)
+
+    def _record_sent(self, reminder: Reminder) -> None:
+        """
+        Queue the removal (or the repeat) of a sent reminder. The sends that
+        complete in the same event loop iteration share one storage write.
+        """
+        if not self._sent:
+            asyncio.get_running_loop().call_soon(self._flush_sent)
+        self._sent.append(reminder)
+
+    def _flush_sent(self) -> None:
+        sent, self._sent = self._sent, []
+        if not sent:
+            return
+        try:
+            with self.reminder_service.batch():
+                for reminder in sent:
+                    if reminder.repeat:
+                        self.reminder_service.repeat_reminder(reminder.doc_id)
+                    else:
+                        # Remove sent reminder
+                        self.reminder_service.delete_reminder(reminder.doc_id)
+        except Exception as e:
+            # Sent again after a restart
+            logging.error(f"Failed to remove or repeat {len(sent)} sent reminders: {e}")
 
+    @check_reminders.before_loop
+    async def before_check_reminders(self) -> None:
+        await self.bot.wait_until_ready()
+        self.queue.clear()
+        self.reminders.clear()
+        for reminder in self.reminder_service.get_all_reminders():
+            self.reminder_changed(reminder.doc_id, reminder)
 
     def cog_unload(self) -> None:
-        self.check_reminders.cancel()
\ No newline at end of file
+        self._flush_sent()
+        self.check_reminders.cancel()
+        if self._owns_dispatcher:
+            self.dispatcher.close()
+        self.reminder_service.remove_listener(self.reminder_changed)
\ No newline at end of file
@@ -1,8 +1,19 @@
+import argparse
+import asyncio
+import hashlib
 import json
-import time
-from garlandtools import GarlandTools
+import os
+from utils.compiled_catalog import write_compiled_catalog
+from utils.garland_tools import (
+    COMPILED_CATALOG_PATH, DATA_PATH, GATHERING_ITEMS_PATH, NODES_PATH, item_path, node_path
+)
+from utils.http_client import GARLAND_TOOLS_URL, HttpClient
+from utils.rate_limit import TokenBucket
 
-gt = GarlandTools()
+# Body digests of every node and its items, and their entries, from the last run, used by --incremental
+STATE_PATH = "gathering_items.state.json"
+DIFF_PATH = "gathering_items.diff.json"
+CACHE_DIR = ".garland_cache"
 
 
 def resolve_map_path(zone_id: int, location_index: dict) -> str | None:
@@ -21,43 +32,136 @@ def resolve_map_path(zone_id: int, location_index: dict) -> str | None:
     return f"{parent['name']}/{zone['name']}"
 
 
-def main():
+class Fetcher:
+    """
+    Bounded concurrency on top of the HttpClient. Bodies can also be recorded
+    under record_dir, with the same paths, to be replayed by serve_fixtures.py.
+    """
+
+    def __init__(self, client: HttpClient, concurrency: int, record_dir: str | None = None):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.record_dir = record_dir
+
+    async def fetch(self, path: str) -> tuple[bytes, str]:
+        """
+        :return: The body and its digest.
+        """
+        async with self.semaphore:
+            body = await self.client.get(path)
+
+        if self.record_dir:
+            record_path = os.path.join(self.record_dir, *path.split("/"))
+            os.makedirs(os.path.dirname(record_path), exist_ok=True)
+            with open(record_path, "wb") as f:
+                f.write(body)
+
+        return body, hashlib.sha1(body).hexdigest()
+
+    async def fetch_json(self, path: str):
+        body, _ = await self.fetch(path)
+        return json.loads(body)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Build gathering_items.json and the compiled catalog")
+    parser.add_argument("--compile-only", action="store_true",
+                        help="only compile the existing gathering_items.json, without fetching")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rebuild the nodes whose node or item data changed since the last run")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--rate", type=float, default=4.0, help="requests per second")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="on disk HTTP response cache")
+    parser.add_argument("--record", metavar="DIR", help="also save the responses under DIR")
+    parser.add_argument("--base-url", default=os.getenv("GARLAND_TOOLS_URL", GARLAND_TOOLS_URL),
+                        help="GarlandTools url, or a local fixture server")
+    args = parser.parse_args()
+
+    if not args.compile_only:
+        client = HttpClient(
+            base_url=args.base_url,
+            cache_dir=args.cache_dir,
+            rate_limiter=TokenBucket(args.rate, capacity=args.rate),
+        )
+        async with client:
+            await generate(Fetcher(client, args.concurrency, args.record), args.incremental)
+
+    compile_catalog()
+
+
+def compile_catalog(path: str = GATHERING_ITEMS_PATH, compiled_path: str = COMPILED_CATALOG_PATH):
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+
+    write_compiled_catalog(compiled_path, entries)
+    print(f"Compiled {len(entries)} items to {compiled_path}")
+
+
+def _load_json(path: str, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _write_json(path: str, data, indent: int | None = None):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+async def generate(fetcher: Fetcher, incremental: bool = False):
+    state = _load_json(STATE_PATH, None) if incremental else None
+    if incremental and state is None:
+        print(f"No {STATE_PATH} found, running a full refresh")
+
     print("Fetching data.json...")
-    data = gt.data().json()
-    location_index = data["locationIndex"]
+    body, data_digest = await fetcher.fetch(DATA_PATH)
+    location_index = json.loads(body)["locationIndex"]
+
+    # The zone names and map paths of every node come from data.json
+    previous_nodes = {}
+    if state is not None and state["data"] == data_digest:
+        previous_nodes = state["nodes"]
+    elif state is not None:
+        print("data.json changed, rebuilding every node")
 
     print("Fetching all nodes...")
-    all_nodes = gt.nodes().json()
+    all_nodes = await fetcher.fetch_json(NODES_PATH)
 
     timed_nodes = [n for n in all_nodes["browse"] if "ti" in n]
     print(f"Found {len(timed_nodes)} timed nodes out of {len(all_nodes['browse'])} total")
 
-    results = []
-    seen_item_ids: set[int] = set()
-    duplicate_item_ids: set[int] = set()
+    done = 0
+    reused = 0
 
-    for i, partial in enumerate(timed_nodes):
+    async def build_node(partial: dict) -> dict:
+        nonlocal done, reused
         node_id = partial["i"]
         zone_id = partial.get("z")
-        map_path = resolve_map_path(zone_id, location_index) if zone_id else None
-
-        print(f"[{i+1}/{len(timed_nodes)}] Fetching node {node_id}...")
-        node_data = gt.node(node_id).json()
-        node = node_data["node"]
 
-        for item_entry in node.get("items", []):
-            item_id = item_entry["id"]
+        body, digest = await fetcher.fetch(node_path(node_id))
+        node = json.loads(body)["node"]
+        item_ids = [item_entry["id"] for item_entry in node.get("items", [])]
+        # Always revalidated through the ETag cache, an unchanged item only costs a 304
+        items = await asyncio.gather(*(fetcher.fetch(item_path(item_id)) for item_id in item_ids))
+        item_digests = {str(item_id): item_digest for item_id, (_, item_digest) in zip(item_ids, items)}
 
-            if item_id in seen_item_ids:
-                duplicate_item_ids.add(item_id)
-            else:
-                seen_item_ids.add(item_id)
-
-            print(f"  Fetching item {item_id}...")
-            item_data = gt.item(item_id).json()["item"]
-            time.sleep(0.5)
+        previous = previous_nodes.get(str(node_id))
+        if (previous is not None and previous["digest"] == digest
+                and previous.get("item_digests") == item_digests):
+            done += 1
+            reused += 1
+            print(f"[{done}/{len(timed_nodes)}] Node {node_id} unchanged")
+            return previous
 
-            results.append({
+        map_path = resolve_map_path(zone_id, location_index) if zone_id else None
+        entries = []
+        for item_id, (item_body, _) in zip(item_ids, items):
+            item_data = json.loads(item_body)["item"]
+            entries.append({
                 "item_id": item_id,
                 "name": item_data.get("name", f"Unknown ({item_id})"),
                 "description": item_data.get("description", ""),
@@ -74,21 +178,82 @@ def main():
                 "limit_type": node.get("limitType"),
             })
 
-        time.sleep(0.5)
+        done += 1
+        print(f"[{done}/{len(timed_nodes)}] Node {node_id} fetched, {len(entries)} items")
+        return {"digest": digest, "item_digests": item_digests, "entries": entries}
+
+    nodes = await asyncio.gather(*(build_node(partial) for partial in timed_nodes))
+    if incremental:
+        print(f"\n{reused} nodes unchanged, {len(nodes) - reused} rebuilt")
+
+    results = []
+    seen_item_ids: set[int] = set()
+    duplicate_item_ids: set[int] = set()
+    for node in nodes:
+        for entry in node["entries"]:
+            if entry["item_id"] in seen_item_ids:
+                duplicate_item_ids.add(entry["item_id"])
+            else:
+                seen_item_ids.add(entry["item_id"])
+            results.append(entry)
 
     # Strip duplicates from results
     results = [r for r in results if r["item_id"] not in duplicate_item_ids]
 
     print(f"\nRemoved {len(duplicate_item_ids)} items found on multiple nodes:")
     for item_id in sorted(duplicate_item_ids):
-        # Find the name from any result before stripping (already removed, so check seen)
         print(f"  - item {item_id}")
 
-    with open("gathering_items.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    diff = diff_items(_load_json(GATHERING_ITEMS_PATH, []), results)
+    _write_json(DIFF_PATH, diff, indent=2)
+    print(
+        f"\n{len(diff['added'])} added, {len(diff['removed'])} removed, "
+        f"{len(diff['changed'])} changed, see {DIFF_PATH}"
+    )
+
+    _write_json(GATHERING_ITEMS_PATH, results, indent=2)
+    _write_json(STATE_PATH, {
+        "data": data_digest,
+        "nodes": {str(partial["i"]): node for partial, node in zip(timed_nodes, nodes)},
+    })
+
+    print(f"\nDone. {len(results)} items written to {GATHERING_ITEMS_PATH}")
+
+
+def diff_items(old: list[dict], new: list[dict]) -> dict:
+    """
+    Compare two versions of gathering_items.json by item id.
+
+    Returns:
+        dict with the added and removed items and, for the changed ones, the
+        old and new value of every field that differs.
+    """
+    old_by_id = {entry["item_id"]: entry for entry in old}
+    new_by_id = {entry["item_id"]: entry for entry in new}
+
+    changed = []
+    for item_id in sorted(old_by_id.keys() & new_by_id.keys()):
+        before, after = old_by_id[item_id], new_by_id[item_id]
+        fields = {
+            field: [before.get(field), after.get(field)]
+            for field in sorted(before.keys() | after.keys())
+            if before.get(field) != after.get(field)
+        }
+        if fields:
+            changed.append({"item_id": item_id, "name": after["name"], "fields": fields})
 
-    print(f"\nDone. {len(results)} items written to gathering_items.json")
+    return {
+        "added": [
+            {"item_id": item_id, "name": new_by_id[item_id]["name"]}
+            for item_id in sorted(new_by_id.keys() - old_by_id.keys())
+        ],
+        "removed": [
+            {"item_id": item_id, "name": old_by_id[item_id]["name"]}
+            for item_id in sorted(old_by_id.keys() - new_by_id.keys())
+        ],
+        "changed": changed,
+    }
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import asyncio
+import os
+from utils.garland_tools import load_gathering_items, zone_map_path
+from utils.http_client import GARLAND_TOOLS_URL, HttpClient
+from utils.map_bundle import write_bundle
+from utils.map_cache import render_key
+from utils.map_render import map_style_from_env
+from utils.render_pool import RenderPool
+
+MAP_BUNDLE_PATH = "map_bundle.bin"
+
+
+async def main():
+    gathering_items = load_gathering_items().items
+    # The bot only serves the bundle when it runs with the same MAP_* settings
+    style = map_style_from_env()
+
+    # Several items can share a node, render each node once
+    nodes = {}
+    for item in gathering_items:
+        key = render_key(item.node.id, item.map, item.node.coordinates, item.zone, style.key)
+        nodes.setdefault(key, item)
+
+    print(f"Rendering {len(nodes)} node maps as {style.key}...")
+    render_pool = RenderPool()
+    async with HttpClient(base_url=os.getenv("GARLAND_TOOLS_URL", GARLAND_TOOLS_URL)) as client:
+
+        async def render(item):
+            map_file = await client.get_file(zone_map_path(item.map))
+            coordinates = item.node.coordinates
+            return await render_pool.render(map_file, (coordinates[0], coordinates[1]), item.zone, style)
+
+        try:
+            images = await asyncio.gather(*(render(item) for item in nodes.values()))
+        finally:
+            render_pool.close()
+
+    renders = dict(zip(nodes, images))
+    write_bundle(MAP_BUNDLE_PATH, renders)
+
+    total = sum(len(image) for image in images)
+    print(f"\nDone. {len(renders)} maps ({total // 1024} KiB) written to {MAP_BUNDLE_PATH}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,46 +1,130 @@
-from tinydb import TinyDB
 from cogs.garland import GarlandCog
 from cogs.reminders import ReminderCog
 from cogs.timezone import TimezoneCog
 from services.gt_reminder_service import GtAlertService
 from services.reminder_service import ReminderService
 from services.timezone_service import TimezoneService
-from utils.logging_config import init_logging
+from storage import open_storage, watch_changes
+from utils.dispatcher import Dispatcher
+from utils.http_client import HttpClient, GARLAND_TOOLS_URL
+from utils.logging_config import CorrelatedCommandTree, init_logging, shutdown_logging
+from utils.map_bundle import MapBundle
+from utils.map_cache import MapCache
+from utils.map_render import map_style_from_env
+from utils.metrics import monitor_event_loop_lag, start_metrics_server
+from utils.render_pool import RenderPool
+from utils.sharding import parse_shard_ids
 from discord.ext import commands
 import discord
 import asyncio
 import os
+import signal
 
 
 async def main():
-    init_logging()
+    init_logging(
+        level=os.getenv('LOG_LEVEL', 'ERROR'),
+        log_file=os.getenv('LOG_FILE', 'app.log') or None,
+        json_lines=os.getenv('LOG_FORMAT', '').lower() == 'json',
+        max_bytes=int(os.getenv('LOG_MAX_MB', '10')) * 1024 * 1024,
+        backup_count=int(os.getenv('LOG_BACKUPS', '5')),
+        rotate_when=os.getenv('LOG_ROTATE_WHEN'),
+    )
 
     intents = discord.Intents.default()
-    bot = commands.Bot(command_prefix="/", intents=intents)
+    # SHARD_COUNT=auto shards in this process, a number with SHARD_IDS runs a part of
+    # the shards (see launch_shards.py)
+    shard_count = os.getenv('SHARD_COUNT')
+    if shard_count:
+        bot = commands.AutoShardedBot(
+            command_prefix="/", intents=intents, tree_cls=CorrelatedCommandTree,
+            shard_count=None if shard_count == 'auto' else int(shard_count),
+            shard_ids=parse_shard_ids(os.getenv('SHARD_IDS')),
+        )
+    else:
+        bot = commands.Bot(command_prefix="/", intents=intents, tree_cls=CorrelatedCommandTree)
 
-    db = TinyDB('panda_bot.json')
-    timezones_table = db.table('timezones')
-    timezone_service = TimezoneService(timezones_table)
+    storage_backend = os.getenv('STORAGE_BACKEND', 'tinydb')
+    if os.getenv('SHARD_IDS') and storage_backend == 'tinydb':
+        # Every process would rewrite the whole JSON file with its own copy
+        raise ValueError("Shard processes share the storage, set STORAGE_BACKEND=sqlite")
+    storage = open_storage(storage_backend, os.getenv('DB_PATH'))
+    timezone_service = TimezoneService(storage.timezones)
+    reminder_service = ReminderService(storage.reminders)
+    gt_reminder_service = GtAlertService(storage.alerts)
 
-    reminders_table = db.table('reminders')
-    reminder_service = ReminderService(reminders_table)
+    map_cache = MapCache(
+        render_budget=int(os.getenv('MAP_CACHE_RENDER_MB', '64')) * 1024 * 1024,
+        disk_dir=os.getenv('MAP_CACHE_DIR'),
+    )
+    http_client = HttpClient(
+        base_url=os.getenv('GARLAND_TOOLS_URL', GARLAND_TOOLS_URL),
+        cache_dir=os.path.join(os.getenv('MAP_CACHE_DIR'), 'http') if os.getenv('MAP_CACHE_DIR') else None,
+    )
+    map_bundle_path = os.getenv('MAP_BUNDLE_PATH', 'map_bundle.bin')
+    map_bundle = MapBundle(map_bundle_path) if os.path.exists(map_bundle_path) else None
+    render_workers = os.getenv('RENDER_WORKERS')
+    render_pool = RenderPool(
+        max_workers=int(render_workers) if render_workers else None,
+        base_map_budget=int(os.getenv('MAP_CACHE_BASE_MB', '256')) * 1024 * 1024,
+    )
 
-    gt_reminders_table = db.table('gt_reminders')
-    gt_reminder_service = GtAlertService(gt_reminders_table)
+    # Shared so the alerts and the reminders go through the same global rate limit
+    dispatcher = Dispatcher(workers=int(os.getenv('NOTIFY_WORKERS', '8')))
 
     @bot.event
     async def on_ready():
         print(f"{bot.user} is online!")
-        await bot.tree.sync()
+        # The commands are global, a single shard process syncs them
+        shard_ids = getattr(bot, 'shard_ids', None)
+        if not shard_ids or 0 in shard_ids:
+            await bot.tree.sync()
 
 
+    # Opt-in, local only unless METRICS_HOST says otherwise
+    metrics_runner = None
+    if os.getenv('METRICS_PORT'):
+        metrics_runner = await start_metrics_server(os.getenv('METRICS_HOST', '127.0.0.1'), int(os.getenv('METRICS_PORT')))
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+
+    # Stop cleanly on SIGTERM (container stop) so pending writes are flushed
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+
     async with bot:
         #await bot.load_extension('cogs.misc')
-        #await bot.add_cog(ReminderCog(bot, timezone_service, reminder_service))
+        #await bot.add_cog(ReminderCog(bot, timezone_service, reminder_service, dispatcher))
         await bot.add_cog(TimezoneCog(bot, timezone_service))
-        await bot.add_cog(GarlandCog(bot, gt_reminder_service, timezone_service))
+        garland_cog = GarlandCog(
+            bot, gt_reminder_service, timezone_service, map_cache, render_pool, http_client, map_bundle,
+            watch_catalog=os.getenv('CATALOG_WATCH', '').lower() in ('1', 'true', 'yes'),
+            dispatcher=dispatcher,
+            # MAP_FORMAT, MAP_QUALITY, MAP_CROP and MAP_MAX_SIZE
+            map_style=map_style_from_env(),
+        )
+        await bot.add_cog(garland_cog)
+
+        # Shard processes share the database, pick up what the others write
+        change_watcher = None
+        if storage_backend == 'sqlite':
+            change_watcher = asyncio.create_task(watch_changes(storage, {
+                "timezones": timezone_service.refresh,
+                "gt_reminders": garland_cog.refresh_alerts,
+            }))
 
-        await bot.start(os.getenv('TOKEN'))
+        try:
+            await bot.start(os.getenv('TOKEN'))
+        finally:
+            lag_monitor.cancel()
+            if change_watcher is not None:
+                change_watcher.cancel()
+            dispatcher.close()
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+            render_pool.close()
+            await http_client.close()
+            storage.close()
+            shutdown_logging()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
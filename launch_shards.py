@@ -0,0 +1,90 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from utils.sharding import split_shards
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def shard_env(base_env: dict, shard_count: int, shard_ids: list[int], index: int) -> dict:
+    """
+    Environment of one shard process: its shards, and its own log file and
+    metrics port so the processes don't write over each other.
+    """
+    env = dict(base_env)
+    env["SHARD_COUNT"] = str(shard_count)
+    env["SHARD_IDS"] = ",".join(str(shard_id) for shard_id in shard_ids)
+    log_file = base_env.get("LOG_FILE", "app.log")
+    if log_file:
+        root, extension = os.path.splitext(log_file)
+        env["LOG_FILE"] = f"{root}.{index}{extension}"
+    if base_env.get("METRICS_PORT"):
+        env["METRICS_PORT"] = str(int(base_env["METRICS_PORT"]) + index)
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the bot as several processes, each connecting a part of the shards"
+    )
+    parser.add_argument("--shards", type=int, required=True, help="total shard count")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--stagger", type=float, default=5.0,
+        help="seconds between process starts, Discord limits how fast shards identify",
+    )
+    args = parser.parse_args()
+
+    if args.processes < 1 or args.shards < args.processes:
+        parser.error("need at least one shard per process")
+    if os.getenv("STORAGE_BACKEND", "tinydb") != "sqlite":
+        parser.error("the processes share the storage, set STORAGE_BACKEND=sqlite")
+
+    processes: list[subprocess.Popen] = []
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index, shard_ids in enumerate(split_shards(args.shards, args.processes)):
+        if index and args.stagger:
+            time.sleep(args.stagger)
+        if stopping:
+            break
+        print(f"Starting process {index} with shards {shard_ids}")
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, "index.py")],
+            cwd=BASE_DIR,
+            env=shard_env(os.environ, args.shards, shard_ids, index),
+        ))
+
+    # One process down leaves its guilds without alerts, stop them all so the
+    # container gets restarted as a whole
+    exit_code = 0
+    while processes:
+        for process in processes[:]:
+            code = process.poll()
+            if code is None:
+                continue
+            processes.remove(process)
+            if code != 0 and exit_code == 0:
+                print(f"Shard process {process.pid} exited with {code}, stopping the others")
+                exit_code = code
+                stop(None, None)
+        time.sleep(0.5)
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
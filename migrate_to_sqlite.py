@@ -0,0 +1,51 @@
+import argparse
+import os
+from storage import SQLiteStorage, TinyDBStorage
+
+TABLES = ["alerts", "reminders", "timezones"]
+
+
+def migrate(source_path: str, target_path: str) -> dict[str, int]:
+    """
+    Copy every table of a TinyDB file into a SQLite database, keeping the doc ids.
+    Runs in a single transaction, nothing is written if it fails.
+    """
+    source = TinyDBStorage(source_path)
+    target = SQLiteStorage(target_path)
+    counts = {}
+
+    try:
+        with target.transaction():
+            for name in TABLES:
+                source_table = getattr(source, name)
+                target_table = getattr(target, name)
+                documents = source_table.all()
+                for document in documents:
+                    target_table.insert(document, doc_id=document.doc_id)
+                counts[name] = len(documents)
+    finally:
+        source.close()
+        target.close()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a panda_bot.json TinyDB file into SQLite")
+    parser.add_argument("source", nargs="?", default="panda_bot.json")
+    parser.add_argument("target", nargs="?", default="panda_bot.sqlite3")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} does not exist")
+    if os.path.exists(args.target):
+        parser.error(f"{args.target} already exists, refusing to import twice")
+
+    counts = migrate(args.source, args.target)
+    for name, count in counts.items():
+        print(f"{name}: {count} rows")
+    print(f"\nDone. Run the bot with STORAGE_BACKEND=sqlite DB_PATH={args.target}")
+
+
+if __name__ == "__main__":
+    main()
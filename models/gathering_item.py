@@ -15,7 +15,7 @@ class GatheringReminder:
     last_notification_ts: str
     doc_id: Optional[int] = None
 
-@dataclass()
+@dataclass(slots=True)
 class GatheringNode:
     id: int
     name: str
@@ -26,12 +26,13 @@ class GatheringNode:
     time_formatted: str
     map_output: Optional[BytesIO] = None
 
-@dataclass
+@dataclass(slots=True)
 class GatheringItem:
     id: int
     name: str
     name_lower: str
-    description: str
+    # None until loaded, see GatheringCatalog.describe
+    description: Optional[str]
     map:str
     zone: str
     node: GatheringNode
@@ -0,0 +1,32 @@
+import argparse
+import os
+from aiohttp import web
+
+
+def make_app(fixtures_dir: str) -> web.Application:
+    """
+    Serves recorded GarlandTools responses (see generate_gathering_json.py --record)
+    from fixtures_dir. Files keep their upstream paths and are served with
+    ETag / Last-Modified, so conditional requests get a 304 like upstream.
+    """
+    app = web.Application()
+    app.router.add_static("/", fixtures_dir)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded GarlandTools responses")
+    parser.add_argument("fixtures_dir", help="directory written by generate_gathering_json.py --record")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.fixtures_dir):
+        parser.error(f"{args.fixtures_dir} is not a directory")
+
+    print(f"Point GARLAND_TOOLS_URL or --base-url to http://{args.host}:{args.port}/")
+    web.run_app(make_app(args.fixtures_dir), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
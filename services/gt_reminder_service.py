@@ -1,48 +1,78 @@
-from datetime import datetime, timezone
+from datetime import datetime
+from typing import Callable, Optional
 from zoneinfo import ZoneInfo
 
-from tinydb import Query, where
-
 from models import GatheringReminder
 from utils.db_utils import dataclass_to_document, document_to_dataclass
 
 
+AlertListener = Callable[[int, Optional[GatheringReminder]], None]
+
+
 class GtAlertService:
     def __init__(self, table):
         self.table = table
-        self.query = Query()
+        self.listeners: list[AlertListener] = []
+
+    def add_listener(self, listener: AlertListener) -> None:
+        """
+        Register a callback called with (doc_id, alert) when an alert is created
+        or toggled, and with (doc_id, None) when it is removed.
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: AlertListener) -> None:
+        self.listeners.remove(listener)
+
+    def _notify(self, doc_id: int, alert: Optional[GatheringReminder]) -> None:
+        for listener in self.listeners:
+            listener(doc_id, alert)
 
     async def get_user_alerts(self, user_id: int):
-        alerts = self.table.search(self.query.user_id == user_id)
+        alerts = self.table.find(user_id=user_id)
         return [document_to_dataclass(alert, GatheringReminder) for alert in alerts]
 
     def get_all_enabled(self) -> list[GatheringReminder]:
-        alerts = self.table.search(where("enable") == True)
+        alerts = self.table.find(enable=True)
         return [document_to_dataclass(alert, GatheringReminder) for alert in alerts]
 
+    def get_alert(self, doc_id: int) -> Optional[GatheringReminder]:
+        alert = self.table.get(doc_id)
+        return document_to_dataclass(alert, GatheringReminder) if alert else None
+
     def get_item_alert_for_user(self, user_id: int, item_id: int) -> GatheringReminder:
-        alert = self.table.get(
-            (self.query.user_id == user_id) & (self.query.item_id == item_id)
-        )
+        alert = self.table.find_one(user_id=user_id, item_id=item_id)
         return document_to_dataclass(alert, GatheringReminder) if alert else None
 
     def update_last_notification(self, doc_id: int, user_zone_info: ZoneInfo) -> None:
         now_ts = str(datetime.now(user_zone_info).isoformat())
-        self.table.update({"last_notification_ts": now_ts}, doc_ids=[doc_id])
+        self.table.update({"last_notification_ts": now_ts}, doc_id)
+
+    def update_last_notifications(self, notified: list[tuple[int, ZoneInfo]]) -> None:
+        """
+        Batched update_last_notification, written in a single transaction.
+        """
+        with self.table.transaction():
+            for doc_id, user_zone_info in notified:
+                self.update_last_notification(doc_id, user_zone_info)
 
     def create_alert(self, reminder: GatheringReminder):
         doc_id = self.table.insert(dataclass_to_document(reminder))
         reminder.doc_id = doc_id
+        self._notify(doc_id, reminder)
         return reminder
 
     async def toggle_reminder(self, doc_id:int):
-        reminder = self.table.get(doc_id=doc_id)
+        reminder = self.table.get(doc_id)
         if reminder is None:
             return
         new_enable = not reminder["enable"]
-        self.table.update({"enable": new_enable}, doc_ids=[doc_id])
+        self.table.update({"enable": new_enable}, doc_id)
         reminder["enable"] = new_enable
-        return document_to_dataclass(reminder, GatheringReminder)
+        alert = document_to_dataclass(reminder, GatheringReminder)
+        self._notify(doc_id, alert)
+        return alert
 
     async def delete_reminder(self, reminder_id: int):
-        self.table.remove(doc_ids=[reminder_id])
\ No newline at end of file
+        self.table.remove(reminder_id)
+        self._notify(reminder_id, None)
\ No newline at end of file
@@ -1,31 +1,66 @@
 from datetime import datetime, UTC, timedelta
+from typing import Callable, Optional
 
-from tinydb import Query
 from models import Reminder
 from utils.db_utils import document_to_dataclass, dataclass_to_document
 
 
+ReminderListener = Callable[[int, Optional[Reminder]], None]
+
+
 class ReminderService:
     def __init__(self, table):
         self.table = table
-        self.query = Query()
+        self.listeners: list[ReminderListener] = []
+
+    def add_listener(self, listener: ReminderListener) -> None:
+        """
+        Register a callback called with (doc_id, reminder) when a reminder is
+        created or rescheduled, and with (doc_id, None) when it is removed.
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: ReminderListener) -> None:
+        self.listeners.remove(listener)
+
+    def _notify(self, doc_id: int, reminder: Optional[Reminder]) -> None:
+        for listener in self.listeners:
+            listener(doc_id, reminder)
+
+    def get_all_reminders(self) -> list[Reminder]:
+        return [document_to_dataclass(reminder, Reminder) for reminder in self.table.all()]
 
     def get_user_reminders(self, user_id: int):
-        reminders = self.table.search(self.query.user_id == user_id)
+        reminders = self.table.find(user_id=user_id)
         return [document_to_dataclass(reminder, Reminder) for reminder in reminders]
 
     def get_due_reminders(self):
         now_date = datetime.now(UTC).isoformat()
-        due_reminders = self.table.search(self.query.remind_at <= now_date)
+        due_reminders = self.table.find_until("remind_at", now_date)
 
         return [document_to_dataclass(reminder, Reminder) for reminder in due_reminders]
 
+    def batch(self):
+        """
+        Context manager grouping the writes made inside it in one storage write.
+        """
+        return self.table.transaction()
+
     def delete_reminder(self, reminder_id: int):
-        self.table.remove(doc_ids=[reminder_id])
+        self.table.remove(reminder_id)
+        self._notify(reminder_id, None)
 
     def repeat_reminder(self, reminder_id: int):
-        future_date = datetime.now(UTC) + timedelta(days=1)
-        self.table.update({"remind_at": future_date.isoformat()}, doc_ids=[reminder_id])
+        reminder = self.table.get(reminder_id)
+        if reminder is None:
+            return
+        future_date = (datetime.now(UTC) + timedelta(days=1)).isoformat()
+        self.table.update({"remind_at": future_date}, reminder_id)
+        reminder["remind_at"] = future_date
+        self._notify(reminder_id, document_to_dataclass(reminder, Reminder))
 
-    def create_reminder(self, reminder: Reminder):
-        self.table.insert(dataclass_to_document(reminder))
\ No newline at end of file
+    def create_reminder(self, reminder: Reminder) -> Reminder:
+        doc_id = self.table.insert(dataclass_to_document(reminder))
+        reminder.doc_id = doc_id
+        self._notify(doc_id, reminder)
+        return reminder
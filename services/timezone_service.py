@@ -1,28 +1,76 @@
-from tinydb import Query
+from typing import Optional
+from zoneinfo import ZoneInfo
+
 from models import Timezone
 from utils.db_utils import document_to_dataclass, dataclass_to_document
+from utils.metrics import CACHE_REQUESTS
 
 TIMEZONES = [
     "Europe/London",
     "Europe/Paris"
 ]
 
+DEFAULT_ZONE_INFO = ZoneInfo("UTC")
+
 class TimezoneService:
     def __init__(self, table):
         self.table = table
-        self.query = Query()
+
+        # Write-through cache of the whole table, user_id -> resolved ZoneInfo
+        self.zones: dict[int, ZoneInfo] = {}
+        self.hits = 0
+        self.misses = 0
+        self._hit_counter = CACHE_REQUESTS.labels("timezones", "hit")
+        self._miss_counter = CACHE_REQUESTS.labels("timezones", "miss")
+        self._load()
+
+    def _load(self):
+        for record in self.table.all():
+            timezone = document_to_dataclass(record, Timezone)
+            self.zones[timezone.user_id] = ZoneInfo(timezone.timezone)
+
+    def refresh(self, doc_ids: Optional[list[int]] = None) -> None:
+        """
+        Re-read rows written by another process sharing the storage.
+
+        :param doc_ids: The changed rows, None reloads the whole table.
+        """
+        if doc_ids is not None:
+            records = [self.table.get(doc_id) for doc_id in doc_ids]
+            if None not in records:
+                for record in records:
+                    timezone = document_to_dataclass(record, Timezone)
+                    self.zones[timezone.user_id] = ZoneInfo(timezone.timezone)
+                return
+
+        # A removed row doesn't tell whose timezone it was
+        self.zones = {}
+        self._load()
+
+    def get_user_zone_info(self, user_id: int, default: Optional[ZoneInfo] = None) -> Optional[ZoneInfo]:
+        zone_info = self.zones.get(user_id)
+        if zone_info is None:
+            # The cache holds every row, a miss means the user never set a timezone
+            self.misses += 1
+            self._miss_counter.inc()
+            return default
+
+        self.hits += 1
+        self._hit_counter.inc()
+        return zone_info
 
     def get_user_timezone(self, user_id: int):
-        record = self.table.get(self.query.user_id == user_id)
-        if not record:
+        zone_info = self.get_user_zone_info(user_id)
+        if not zone_info:
             return None
 
-        timezone = document_to_dataclass(record, Timezone)
-        return timezone.timezone
+        return zone_info.key
 
     def set_user_timezone(self, user_id: int, timezone_str: str):
+        zone_info = ZoneInfo(timezone_str)
         timezone = Timezone(user_id=user_id, timezone=timezone_str)
         self.table.upsert(
             dataclass_to_document(timezone),
-            self.query.user_id == user_id
-        )
\ No newline at end of file
+            user_id=user_id
+        )
+        self.zones[user_id] = zone_info
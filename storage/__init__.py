@@ -0,0 +1,25 @@
+from .tinydb_storage import TinyDBStorage, TinyDBTable, WriteBehindJSONStorage
+from .sqlite_storage import SQLiteStorage, SQLiteTable, watch_changes
+
+BACKENDS = {
+    "tinydb": TinyDBStorage,
+    "sqlite": SQLiteStorage,
+}
+
+
+def open_storage(backend: str = "tinydb", path: str | None = None):
+    """
+    Open the storage of the bot tables.
+
+    :param backend: "tinydb" (default) or "sqlite".
+    :param path: The database file, defaults to the backend default.
+    """
+    try:
+        storage_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend {backend}, expected one of {', '.join(BACKENDS)}")
+
+    return storage_class(path) if path else storage_class()
+
+
+__all__ = ["TinyDBStorage", "TinyDBTable", "WriteBehindJSONStorage", "SQLiteStorage", "SQLiteTable", "open_storage", "watch_changes"]
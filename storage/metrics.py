@@ -0,0 +1,28 @@
+from functools import wraps
+from utils.metrics import REGISTRY
+import time
+
+STORAGE_OPERATION_SECONDS = REGISTRY.histogram(
+    "pandabot_storage_operation_seconds", "Duration of the storage table operations",
+    ("backend", "table", "operation"),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+
+
+def timed(operation: str):
+    """
+    Record the duration of a table method, labelled with the backend and table
+    name of the table it is called on.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                STORAGE_OPERATION_SECONDS.labels(self.backend, self.name, operation).observe(
+                    time.perf_counter() - start
+                )
+        return wrapper
+    return decorator
@@ -0,0 +1,304 @@
+from contextlib import contextmanager
+from typing import Callable, Optional
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+
+from tinydb.table import Document
+
+from .metrics import timed
+
+# Column types: INTEGER and TEXT are stored as is, BOOLEAN as 0/1, JSON as text
+SCHEMAS = {
+    "gt_reminders": {
+        "user_id": "INTEGER",
+        "channel_id": "INTEGER",
+        "item_id": "INTEGER",
+        "item_name": "TEXT",
+        "et_hours": "JSON",
+        "duration_et_hours": "INTEGER",
+        "alert_before_minutes": "INTEGER",
+        "enable": "BOOLEAN",
+        "last_notification_ts": "TEXT",
+    },
+    "reminders": {
+        "user_id": "INTEGER",
+        "channel_id": "INTEGER",
+        "remind_at": "TEXT",
+        "message": "TEXT",
+        "repeat": "BOOLEAN",
+    },
+    "timezones": {
+        "user_id": "INTEGER",
+        "timezone": "TEXT",
+    },
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS gt_reminders_user_id ON gt_reminders (user_id)",
+    "CREATE INDEX IF NOT EXISTS gt_reminders_user_item ON gt_reminders (user_id, item_id)",
+    "CREATE INDEX IF NOT EXISTS gt_reminders_enable ON gt_reminders (enable)",
+    "CREATE INDEX IF NOT EXISTS reminders_user_id ON reminders (user_id)",
+    "CREATE INDEX IF NOT EXISTS reminders_remind_at ON reminders (remind_at)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS timezones_user_id ON timezones (user_id)",
+]
+
+# Columns whose updates other processes don't need to hear about, the alerts
+# last notification is only read by the process that sends them
+UNWATCHED_COLUMNS = {
+    "gt_reminders": {"last_notification_ts"},
+}
+
+CHANGES_POLL_INTERVAL = 2.0
+
+# How long the changes stay in the log, a process that didn't read them by
+# then reloads everything
+CHANGES_RETENTION = 24 * 60 * 60
+CHANGES_PRUNE_INTERVAL = 60 * 60
+
+
+class SQLiteTable:
+    """
+    Storage table backed by an indexed SQLite table, same interface as TinyDBTable.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, storage: "SQLiteStorage", name: str):
+        self.storage = storage
+        self.name = name
+        self.columns = SCHEMAS[name]
+        self._select = f"SELECT doc_id, {', '.join(self.columns)} FROM {name}"
+
+    def transaction(self):
+        return self.storage.transaction()
+
+    def _encode(self, name: str, value):
+        column_type = self.columns[name]
+        if column_type == "JSON":
+            return json.dumps(value)
+        if column_type == "BOOLEAN":
+            return None if value is None else int(value)
+        return value
+
+    def _decode(self, row: sqlite3.Row) -> Document:
+        document = {}
+        for name, column_type in self.columns.items():
+            value = row[name]
+            if column_type == "JSON" and value is not None:
+                value = json.loads(value)
+            elif column_type == "BOOLEAN" and value is not None:
+                value = bool(value)
+            document[name] = value
+        return Document(document, doc_id=row["doc_id"])
+
+    def _where(self, fields: dict) -> tuple[str, list]:
+        clause = " AND ".join(f"{name} = ?" for name in fields)
+        return clause, [self._encode(name, value) for name, value in fields.items()]
+
+    def _query(self, sql: str, params=()) -> list[Document]:
+        return [self._decode(row) for row in self.storage.execute(sql, params)]
+
+    @timed("all")
+    def all(self) -> list[Document]:
+        return self._query(self._select)
+
+    @timed("get")
+    def get(self, doc_id: int) -> Optional[Document]:
+        rows = self._query(f"{self._select} WHERE doc_id = ?", (doc_id,))
+        return rows[0] if rows else None
+
+    @timed("find")
+    def find(self, **fields) -> list[Document]:
+        clause, params = self._where(fields)
+        return self._query(f"{self._select} WHERE {clause}", params)
+
+    @timed("find_one")
+    def find_one(self, **fields) -> Optional[Document]:
+        clause, params = self._where(fields)
+        rows = self._query(f"{self._select} WHERE {clause} LIMIT 1", params)
+        return rows[0] if rows else None
+
+    @timed("find_until")
+    def find_until(self, field: str, value) -> list[Document]:
+        return self._query(f"{self._select} WHERE {field} <= ? ORDER BY {field}", (self._encode(field, value),))
+
+    @timed("insert")
+    def insert(self, document: dict, doc_id: Optional[int] = None) -> int:
+        names = ["doc_id"] + list(self.columns)
+        values = [doc_id] + [self._encode(name, document.get(name)) for name in self.columns]
+        placeholders = ", ".join("?" for _ in names)
+        cursor = self.storage.execute(
+            f"INSERT INTO {self.name} ({', '.join(names)}) VALUES ({placeholders})", values
+        )
+        return cursor.lastrowid
+
+    @timed("update")
+    def update(self, fields: dict, doc_id: int) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        params = [self._encode(name, value) for name, value in fields.items()] + [doc_id]
+        self.storage.execute(f"UPDATE {self.name} SET {assignments} WHERE doc_id = ?", params)
+
+    @timed("upsert")
+    def upsert(self, document: dict, **fields) -> None:
+        with self.storage.transaction():
+            existing = self.find_one(**fields)
+            if existing is None:
+                self.insert(document)
+            else:
+                self.update(document, existing.doc_id)
+
+    @timed("remove")
+    def remove(self, doc_id: int) -> None:
+        self.storage.execute(f"DELETE FROM {self.name} WHERE doc_id = ?", (doc_id,))
+
+
+class SQLiteStorage:
+    """
+    All the bot tables in a SQLite database in WAL mode.
+
+    Statements autocommit unless they run inside transaction(), which batches
+    them in a single commit.
+    """
+
+    def __init__(self, path: str = "panda_bot.sqlite3"):
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._transaction_depth = 0
+        self._create_schema()
+
+        self.alerts = SQLiteTable(self, "gt_reminders")
+        self.reminders = SQLiteTable(self, "reminders")
+        self.timezones = SQLiteTable(self, "timezones")
+
+    def _create_schema(self) -> None:
+        for name, columns in SCHEMAS.items():
+            definitions = ", ".join(
+                f"{column} {'TEXT' if column_type == 'JSON' else 'INTEGER' if column_type == 'BOOLEAN' else column_type}"
+                for column, column_type in columns.items()
+            )
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} (doc_id INTEGER PRIMARY KEY AUTOINCREMENT, {definitions})"
+            )
+        for index in INDEXES:
+            self.connection.execute(index)
+
+        # Change log filled by triggers, so the processes sharing the database
+        # see the writes of the others (see watch_changes)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT, doc_id INTEGER, changed_at REAL)"
+        )
+        for name, columns in SCHEMAS.items():
+            watched = [column for column in columns if column not in UNWATCHED_COLUMNS.get(name, ())]
+            for event, row in (("INSERT", "NEW"), (f"UPDATE OF {', '.join(watched)}", "NEW"), ("DELETE", "OLD")):
+                self.connection.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {name}_{event.split()[0].lower()}_changes AFTER {event} ON {name} "
+                    f"BEGIN INSERT INTO changes (table_name, doc_id, changed_at) "
+                    f"VALUES ('{name}', {row}.doc_id, (julianday('now') - 2440587.5) * 86400); END"
+                )
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        return self.connection.execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        if self._transaction_depth:
+            # Nested, the outermost transaction commits
+            self._transaction_depth += 1
+            try:
+                yield
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        self._transaction_depth = 1
+        self.connection.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        else:
+            self.connection.execute("COMMIT")
+        finally:
+            self._transaction_depth = 0
+
+    def last_change_id(self) -> int:
+        row = self.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row["seq"] if row else 0
+
+    def changes_since(self, change_id: int) -> tuple[int, Optional[dict[str, list[int]]]]:
+        """
+        The rows written since the change change_id, by any process.
+
+        :return: The last change id and the changed doc_ids of every table, None
+                 when the changes were pruned before they could be read.
+        """
+        with self.transaction():
+            rows = self.execute(
+                "SELECT id, table_name, doc_id FROM changes WHERE id > ? ORDER BY id", (change_id,)
+            ).fetchall()
+            last_change_id = rows[-1]["id"] if rows else self.last_change_id()
+
+        # The ids follow each other, a hole after change_id was pruned
+        first_change_id = rows[0]["id"] if rows else last_change_id + 1
+        if first_change_id > change_id + 1:
+            return last_change_id, None
+
+        changed: dict[str, dict[int, None]] = {}
+        for row in rows:
+            changed.setdefault(row["table_name"], {})[row["doc_id"]] = None
+        return last_change_id, {name: list(doc_ids) for name, doc_ids in changed.items()}
+
+    def prune_changes(self, max_age: float = CHANGES_RETENTION) -> None:
+        self.execute("DELETE FROM changes WHERE changed_at < (julianday('now') - 2440587.5) * 86400 - ?", (max_age,))
+
+    def flush(self) -> None:
+        # Statements are committed as they run
+        pass
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+async def watch_changes(
+        storage: SQLiteStorage,
+        handlers: dict[str, Callable[[Optional[list[int]]], None]],
+        interval: float = CHANGES_POLL_INTERVAL,
+) -> None:
+    """
+    Poll the change log and hand the changed doc_ids of each table to its
+    handler, run as a background task. A handler called with None must reload
+    the whole table.
+
+    Keeps the in-memory caches of the processes sharing the database in sync.
+    Their own writes come back too, the handlers skip what they already hold.
+    """
+    change_id = storage.last_change_id()
+    pruned_at = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            change_id, changed = storage.changes_since(change_id)
+            if time.monotonic() - pruned_at > CHANGES_PRUNE_INTERVAL:
+                storage.prune_changes()
+                pruned_at = time.monotonic()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to read the storage changes: {e}")
+            continue
+
+        if changed is None:
+            logging.error("Missed storage changes, reloading every table")
+        for name, handler in handlers.items():
+            doc_ids = None if changed is None else changed.get(name)
+            if changed is not None and not doc_ids:
+                continue
+            try:
+                handler(doc_ids)
+            except Exception as e:
+                logging.error(f"Failed to apply the changes of {name}: {e}")
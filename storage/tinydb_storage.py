@@ -0,0 +1,195 @@
+from contextlib import contextmanager
+from functools import reduce
+from typing import Any, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+from tinydb import TinyDB, where
+from tinydb.storages import Storage
+from tinydb.table import Document, Table
+
+from .metrics import STORAGE_OPERATION_SECONDS, timed
+
+# Longest wait between two attempts of a failing flush
+MAX_FLUSH_RETRY_DELAY = 60.0
+
+
+class WriteBehindJSONStorage(Storage):
+    """
+    TinyDB JSON storage that keeps the database in memory and writes it behind.
+
+    Writes made inside a batch are flushed once when the outermost batch ends,
+    other writes are flushed after flush_delay seconds so a burst of mutations
+    becomes a single write. A flush replaces the file atomically (temporary
+    file, fsync, rename). A failed flush is retried with an exponential backoff,
+    close() flushes whatever is pending and raises if it can't.
+    """
+
+    def __init__(self, path: str, flush_delay: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.flush_delay = flush_delay
+        self.writes = 0
+        self.flushes = 0
+        self._data: Optional[dict[str, dict[str, Any]]] = None
+        self._dirty = False
+        self._batch_depth = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_failures = 0
+
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, encoding="utf-8") as f:
+                self._data = json.load(f)
+
+    def read(self) -> Optional[dict[str, dict[str, Any]]]:
+        return self._data
+
+    def write(self, data: dict[str, dict[str, Any]]) -> None:
+        self._data = data
+        self._dirty = True
+        self.writes += 1
+
+        if self._batch_depth == 0:
+            self._schedule_flush()
+
+    @contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self._try_flush()
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._dirty:
+            return
+
+        start = time.perf_counter()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        # Make the rename itself durable
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+        self._dirty = False
+        self.flushes += 1
+        STORAGE_OPERATION_SECONDS.labels("tinydb", "*", "flush").observe(time.perf_counter() - start)
+
+    def close(self) -> None:
+        self.flush()
+
+    def _try_flush(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            # The writes stay in memory until a flush goes through
+            self._flush_failures += 1
+            delay = min(self.flush_delay * 2 ** self._flush_failures, MAX_FLUSH_RETRY_DELAY)
+            logging.error(f"Failed to write {self.path}, retrying in {delay:.1f} s: {e}")
+            self._schedule_flush(delay)
+        else:
+            self._flush_failures = 0
+
+    def _schedule_flush(self, delay: Optional[float] = None) -> None:
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, migrations), write right away
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.flush_delay if delay is None else delay, self._try_flush)
+
+
+class TinyDBTable:
+    """
+    Storage table backed by a TinyDB table. Every lookup is a full scan.
+    """
+
+    backend = "tinydb"
+
+    def __init__(self, storage: "TinyDBStorage", table: Table):
+        self.storage = storage
+        self.table = table
+        self.name = table.name
+
+    def transaction(self):
+        return self.storage.transaction()
+
+    @staticmethod
+    def _condition(fields: dict):
+        return reduce(lambda a, b: a & b, (where(name) == value for name, value in fields.items()))
+
+    @timed("all")
+    def all(self) -> list[Document]:
+        return self.table.all()
+
+    @timed("get")
+    def get(self, doc_id: int) -> Optional[Document]:
+        return self.table.get(doc_id=doc_id)
+
+    @timed("find")
+    def find(self, **fields) -> list[Document]:
+        return self.table.search(self._condition(fields))
+
+    @timed("find_one")
+    def find_one(self, **fields) -> Optional[Document]:
+        return self.table.get(self._condition(fields))
+
+    @timed("find_until")
+    def find_until(self, field: str, value) -> list[Document]:
+        return self.table.search(where(field) <= value)
+
+    @timed("insert")
+    def insert(self, document: dict) -> int:
+        return self.table.insert(document)
+
+    @timed("update")
+    def update(self, fields: dict, doc_id: int) -> None:
+        self.table.update(fields, doc_ids=[doc_id])
+
+    @timed("upsert")
+    def upsert(self, document: dict, **fields) -> None:
+        self.table.upsert(document, self._condition(fields))
+
+    @timed("remove")
+    def remove(self, doc_id: int) -> None:
+        self.table.remove(doc_ids=[doc_id])
+
+
+class TinyDBStorage:
+    """
+    All the bot tables in a single TinyDB JSON file.
+    """
+
+    def __init__(self, path: str = "panda_bot.json", flush_delay: float = 1.0):
+        self.db = TinyDB(path, storage=WriteBehindJSONStorage, flush_delay=flush_delay)
+        self.alerts = TinyDBTable(self, self.db.table("gt_reminders"))
+        self.reminders = TinyDBTable(self, self.db.table("reminders"))
+        self.timezones = TinyDBTable(self, self.db.table("timezones"))
+
+    def transaction(self):
+        return self.db.storage.batch()
+
+    def flush(self) -> None:
+        self.db.storage.flush()
+
+    def close(self) -> None:
+        self.db.close()
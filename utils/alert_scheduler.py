@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Callable, Optional
+from models import GatheringReminder
+from utils.et_time import batch_spawns, next_spawn_ts, pack_et_hours
+from utils.scheduler import DueQueue
+import numpy as np
+import time
+
+
+class AlertScheduler:
+    """
+    Keeps the next fire time of every enabled gathering alert in a DueQueue.
+
+    An alert fires alert_before_minutes before each spawn of its node. Once fired
+    it is rescheduled for the spawn after, so only the alerts that are due are
+    ever looked at.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.queue = DueQueue(clock)
+        self.alerts: dict[int, GatheringReminder] = {}
+        self._spawns: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+    def load(self, alerts: list[GatheringReminder]) -> None:
+        self.queue.clear()
+        self.alerts.clear()
+        self._spawns.clear()
+        if not alerts:
+            return
+
+        # Next spawn of every alert in one vectorized pass
+        spawns = batch_spawns(
+            pack_et_hours([alert.et_hours for alert in alerts]),
+            np.zeros(len(alerts)),
+            self.clock(),
+        )
+        for alert, spawn_ts in zip(alerts, spawns.next_spawn_ts.tolist()):
+            self._add(alert, spawn_ts)
+
+    def add(self, alert: GatheringReminder) -> None:
+        self._add(alert, next_spawn_ts(alert.et_hours, self.clock()))
+
+    def _add(self, alert: GatheringReminder, spawn_ts: float) -> None:
+        lead = alert.alert_before_minutes * 60
+
+        # Skip the spawn this alert already fired for (e.g. before a restart)
+        if alert.last_notification_ts:
+            last_ts = datetime.fromisoformat(alert.last_notification_ts).timestamp()
+            if last_ts >= spawn_ts - lead:
+                spawn_ts = next_spawn_ts(alert.et_hours, spawn_ts)
+
+        self._schedule(alert, spawn_ts)
+
+    def remove(self, doc_id: int) -> None:
+        self.alerts.pop(doc_id, None)
+        self._spawns.pop(doc_id, None)
+        self.queue.remove(doc_id)
+
+    def alert_changed(self, doc_id: int, alert: Optional[GatheringReminder]) -> None:
+        """
+        Listener for GtAlertService, alert is None when it was removed. An
+        alert already scheduled with the same hours and lead keeps its slot.
+        """
+        if alert is None or not alert.enable:
+            self.remove(doc_id)
+            return
+
+        scheduled = self.alerts.get(doc_id)
+        if (scheduled is not None and scheduled.et_hours == alert.et_hours
+                and scheduled.alert_before_minutes == alert.alert_before_minutes):
+            # Same schedule, e.g. our own write read back from the storage:
+            # adding it again would bring back a spawn it already fired for
+            self.alerts[doc_id] = alert
+            return
+
+        self.add(alert)
+
+    def next_fire(self, doc_id: int) -> Optional[float]:
+        return self.queue.due_ts(doc_id)
+
+    async def wait(self) -> None:
+        await self.queue.wait()
+
+    def pop_due(self, now: Optional[float] = None) -> list[tuple[GatheringReminder, float]]:
+        """
+        Return the (alert, spawn timestamp) pairs due at now and schedule
+        each of them for its following spawn.
+        """
+        due = []
+        for doc_id in self.queue.pop_due(now):
+            alert = self.alerts[doc_id]
+            spawn_ts = self._spawns[doc_id]
+            due.append((alert, spawn_ts))
+            self._schedule(alert, next_spawn_ts(alert.et_hours, spawn_ts))
+        return due
+
+    def _schedule(self, alert: GatheringReminder, spawn_ts: float) -> None:
+        self.alerts[alert.doc_id] = alert
+        self._spawns[alert.doc_id] = spawn_ts
+        self.queue.schedule(alert.doc_id, spawn_ts - alert.alert_before_minutes * 60)
@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+from utils.metrics import CACHE_REQUESTS
+import time
+
+# Unsigned URLs carry no expiry, don't trust them longer than a signed one
+DEFAULT_TTL = 24 * 60 * 60
+
+# Stop handing out a URL this long before it expires: the message must still
+# reach Discord, and its view can be rebuilt by a button click afterwards
+EXPIRY_MARGIN = 60 * 60
+
+MAX_ENTRIES = 10_000
+
+
+def attachment_expiry(url: str) -> Optional[float]:
+    """
+    Epoch seconds after which a signed Discord CDN URL stops working, read from
+    its ex parameter (hexadecimal). None when the URL is not signed.
+    """
+    values = parse_qs(urlsplit(url).query).get("ex")
+    if not values:
+        return None
+    try:
+        return float(int(values[0], 16))
+    except ValueError:
+        return None
+
+
+class AttachmentUrls:
+    """
+    CDN URLs of files already uploaded to Discord, keyed like the renders (see
+    render_key), so later messages reference the file instead of uploading it
+    again. A URL is served until EXPIRY_MARGIN before its signature expires.
+    Lookups are counted in CACHE_REQUESTS as the attachments cache.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = MAX_ENTRIES,
+            margin: float = EXPIRY_MARGIN,
+            default_ttl: float = DEFAULT_TTL,
+            clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.margin = margin
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._hit_counter = CACHE_REQUESTS.labels("attachments", "hit")
+        self._miss_counter = CACHE_REQUESTS.labels("attachments", "miss")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() >= entry[1] - self.margin:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self._miss_counter.inc()
+            return None
+
+        self._hit_counter.inc()
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, url: str) -> None:
+        expires_at = attachment_expiry(url)
+        if expires_at is None:
+            expires_at = self.clock() + self.default_ttl
+
+        self._entries.pop(key, None)
+        self._entries[key] = (url, expires_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str) -> Optional[str]:
+        entry = self._entries.pop(key, None)
+        return None if entry is None else entry[0]
+
+    def remember(self, key: str, message, filename: str) -> Optional[str]:
+        """
+        Store the URL of the attachment named filename of a message just sent.
+
+        :param message: The sent message, None when the send didn't return it.
+        :return: The URL, None when the message has no such attachment.
+        """
+        for attachment in getattr(message, "attachments", None) or ():
+            if attachment.filename == filename:
+                self.put(key, attachment.url)
+                return attachment.url
+        return None
+
+    def clear(self) -> None:
+        self._entries.clear()
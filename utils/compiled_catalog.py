@@ -0,0 +1,220 @@
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from typing import Iterator, Optional
+from models import GatheringItem, GatheringNode
+from utils.et_time import format_et_hours
+import math
+import mmap
+import os
+import struct
+import sys
+
+# File layout:
+#   header  : magic, format version, item count, string count
+#   ids     : the item ids, sorted, used as the id index
+#   records : one fixed size record per item, in id order
+#   strings : (count + 1) end offsets then the utf-8 blob, every distinct
+#             name, zone, map and description is stored once
+CATALOG_MAGIC = b"PCAT"
+CATALOG_VERSION = 1
+_HEADER = struct.Struct("<4sHII")
+_ID = struct.Struct("<I")
+# icon id, node id, node type, duration, hour count, 4 hours, x, y,
+# then string indexes of name, description, map, zone and node name
+_RECORD = struct.Struct("<iIBBB4BddIIIII")
+_OFFSET = struct.Struct("<I")
+
+MAX_ET_HOURS = 4
+NO_STRING = 0xFFFFFFFF
+NO_VALUE = 0xFF
+
+
+def write_compiled_catalog(path: str, entries: list[dict]) -> None:
+    """
+    Write the entries of gathering_items.json to a compiled catalog.
+
+    :param path: The catalog file to write.
+    :param entries: The gathering item entries, as written by generate_gathering_json.py.
+    """
+    entries = sorted(entries, key=lambda entry: entry["item_id"])
+    strings: dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        return strings.setdefault(value, len(strings))
+
+    records = bytearray()
+    for entry in entries:
+        et_times = entry["et_times"]
+        if len(et_times) > MAX_ET_HOURS:
+            raise ValueError(f"Item {entry['item_id']} has more than {MAX_ET_HOURS} spawn hours")
+        hours = list(et_times) + [NO_VALUE] * (MAX_ET_HOURS - len(et_times))
+        coordinates = entry["node_coordinates"]
+        x, y = coordinates if len(coordinates) == 2 else (math.nan, math.nan)
+        icon_id = entry["icon_id"]
+        node_type = entry["node_type"]
+
+        records += _RECORD.pack(
+            -1 if icon_id is None else icon_id,
+            entry["node_id"],
+            NO_VALUE if node_type is None else node_type,
+            entry["duration_et_hours"],
+            len(et_times),
+            *hours,
+            x,
+            y,
+            intern(entry["name"]),
+            intern(entry["description"]),
+            intern(entry["zone_map"]),
+            intern(entry["zone_name"]),
+            intern(entry["node_name"]),
+        )
+
+    blob = bytearray()
+    offsets = bytearray(_OFFSET.pack(0))
+    for value in strings:
+        blob += value.encode("utf-8")
+        offsets += _OFFSET.pack(len(blob))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(CATALOG_MAGIC, CATALOG_VERSION, len(entries), len(strings)))
+        for entry in entries:
+            f.write(_ID.pack(entry["item_id"]))
+        f.write(records)
+        f.write(offsets)
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CompiledCatalog(Sequence):
+    """
+    Read only view of a catalog written by write_compiled_catalog.
+
+    The file is memory mapped. Items are built the first time they are looked
+    up, strings are decoded once and descriptions only when asked for.
+    Items are in id order.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self._count, string_count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != CATALOG_MAGIC or version != CATALOG_VERSION:
+            raise ValueError(f"{path} is not a version {CATALOG_VERSION} gathering catalog")
+
+        self._ids_offset = _HEADER.size
+        self._records_offset = self._ids_offset + self._count * _ID.size
+        self._string_offsets = self._records_offset + self._count * _RECORD.size
+        self._blob_offset = self._string_offsets + (string_count + 1) * _OFFSET.size
+
+        # Native unsigned ints, the file is little endian like the hosts we run on
+        self.ids = memoryview(self._mmap)[self._ids_offset:self._records_offset].cast("I")
+        self._strings: list[Optional[str]] = [None] * string_count
+        self._items: list[Optional[GatheringItem]] = [None] * self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> GatheringItem:
+        item = self._items[position]
+        if item is None:
+            item = self._build(position)
+            self._items[position] = item
+        return item
+
+    def position_of(self, item_id: int) -> Optional[int]:
+        position = bisect_left(self.ids, item_id)
+        if position < self._count and self.ids[position] == item_id:
+            return position
+        return None
+
+    def name_lower(self, position: int) -> str:
+        return self._string(self._record(position)[11]).lower()
+
+    def spawn(self, position: int) -> tuple[int, list[int], int]:
+        """
+        The (item id, ET hours, duration in ET hours) of an item, without building it.
+        """
+        record = self._record(position)
+        return self.ids[position], list(record[5:5 + record[4]]), record[3]
+
+    def description(self, item_id: int) -> str:
+        position = self.position_of(item_id)
+        if position is None:
+            raise KeyError(item_id)
+        return self._string(self._record(position)[12], intern=False) or ""
+
+    def close(self) -> None:
+        self.ids.release()
+        self._mmap.close()
+
+    def _record(self, position: int) -> tuple:
+        return _RECORD.unpack_from(self._mmap, self._records_offset + position * _RECORD.size)
+
+    def _string(self, index: int, intern: bool = True) -> Optional[str]:
+        if index == NO_STRING:
+            return None
+        value = self._strings[index]
+        if value is None:
+            start, end = struct.unpack_from("<II", self._mmap, self._string_offsets + index * _OFFSET.size)
+            value = str(self._mmap[self._blob_offset + start:self._blob_offset + end], "utf-8")
+            if not intern:
+                # Descriptions are shown once in a while, don't keep them around
+                return value
+            value = sys.intern(value)
+            self._strings[index] = value
+        return value
+
+    def _build(self, position: int) -> GatheringItem:
+        (icon_id, node_id, node_type, duration, hour_count, *rest) = self._record(position)
+        hours = list(rest[:hour_count])
+        x, y, name, _, zone_map, zone_name, node_name = rest[MAX_ET_HOURS:]
+
+        node = GatheringNode(
+            id=node_id,
+            name=self._string(node_name),
+            coordinates=[] if math.isnan(x) else [x, y],
+            type=None if node_type == NO_VALUE else node_type,
+            node_duration=duration,
+            time=hours,
+            time_formatted=format_et_hours(hours),
+        )
+        name = self._string(name)
+
+        return GatheringItem(
+            id=self.ids[position],
+            name=name,
+            name_lower=name.lower(),
+            description=None,
+            map=self._string(zone_map),
+            zone=self._string(zone_name),
+            node=node,
+            icon_id=None if icon_id == -1 else icon_id,
+        )
+
+
+class CompiledItemsById(Mapping):
+    """
+    items_by_id over a CompiledCatalog, looked up through the id index.
+    """
+
+    def __init__(self, catalog: CompiledCatalog):
+        self.catalog = catalog
+
+    def __getitem__(self, item_id: int) -> GatheringItem:
+        position = self.catalog.position_of(item_id)
+        if position is None:
+            raise KeyError(item_id)
+        return self.catalog[position]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.catalog.ids)
+
+    def __len__(self) -> int:
+        return len(self.catalog)
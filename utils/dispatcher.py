@@ -0,0 +1,229 @@
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+from utils.metrics import REGISTRY
+from utils.rate_limit import TokenBucket
+import aiohttp
+import asyncio
+import discord
+import heapq
+import itertools
+import logging
+import random
+import time
+
+# Discord allows 5 messages per 5 seconds in a channel and 50 requests per second overall
+CHANNEL_RATE = 1.0
+CHANNEL_BURST = 5.0
+GLOBAL_RATE = 50.0
+
+# Channel buckets kept before the idle ones are dropped
+MAX_CHANNEL_BUCKETS = 10_000
+
+NOTIFICATIONS = REGISTRY.counter(
+    "pandabot_notifications", "Dispatched notifications by result: sent, expired or failed", ("result",)
+)
+NOTIFICATION_RETRIES = REGISTRY.counter("pandabot_notification_retries", "Notification send attempts retried")
+NOTIFICATION_QUEUE = REGISTRY.gauge("pandabot_notification_queue", "Notifications waiting to be sent")
+NOTIFICATION_SEND_SECONDS = REGISTRY.histogram("pandabot_notification_send_seconds", "Duration of a send attempt")
+
+
+@dataclass
+class Notification:
+    """
+    A message to send in a channel.
+
+    :param priority: Sort key, lowest first, e.g. the spawn time of the node.
+    :param send: Builds and sends the message, called again on every attempt. Receives
+        the result of prepare when there is one.
+    :param prepare: Slow work before the send (e.g. a render), run once and outside
+        the rate limits so it doesn't stretch the gap between two requests.
+    :param expires_at: Epoch seconds after which the message is useless and dropped, None to always send.
+    :param description: Names the notification in the logs.
+    """
+    priority: float
+    channel_id: int
+    send: Callable[..., Awaitable[object]]
+    prepare: Optional[Callable[[], Awaitable[object]]] = None
+    expires_at: Optional[float] = None
+    description: str = ""
+    attempts: int = field(default=0, compare=False)
+    prepared: Any = field(default=None, compare=False, repr=False)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Errors that a later attempt may not hit: rate limits, Discord server errors
+    and network failures. Missing permissions or channels are final.
+    """
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+
+class Dispatcher:
+    """
+    Sends notifications from concurrent workers, earliest priority first.
+
+    Every send takes a token from its channel bucket and the global bucket. A
+    notification whose channel is over its limit waits aside without holding a
+    worker, so one busy channel never delays the others. Failed sends are
+    retried with jittered exponential backoff, expired notifications dropped.
+    A rate of None disables that bucket.
+    """
+
+    def __init__(
+            self,
+            workers: int = 8,
+            channel_rate: Optional[float] = CHANNEL_RATE,
+            channel_burst: float = CHANNEL_BURST,
+            global_rate: Optional[float] = GLOBAL_RATE,
+            retries: int = 3,
+            backoff: float = 1.0,
+            clock: Callable[[], float] = time.time,
+            monotonic: Callable[[], float] = time.monotonic,
+            retryable: Callable[[Exception], bool] = is_retryable,
+    ):
+        self.workers = workers
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.global_bucket = TokenBucket(global_rate, global_rate, monotonic) if global_rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.clock = clock
+        self.monotonic = monotonic
+        self.retryable = retryable
+        self._ready: list[tuple[float, int, Notification]] = []
+        self._waiting: list[tuple[float, int, Notification]] = []
+        self._channel_buckets: dict[int, TokenBucket] = {}
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._in_flight = 0
+        self._tasks: list[asyncio.Task] = []
+        NOTIFICATION_QUEUE.set_function(lambda: len(self))
+
+    def __len__(self) -> int:
+        return len(self._ready) + len(self._waiting) + self._in_flight
+
+    def submit(self, notification: Notification) -> None:
+        """
+        Queue a notification, never waits. The workers start on the first call.
+        """
+        self._start()
+        heapq.heappush(self._ready, (notification.priority, next(self._counter), notification))
+        self._idle.clear()
+        self._changed.set()
+
+    async def join(self) -> None:
+        """
+        Wait until every submitted notification is sent, dropped or failed.
+        """
+        if self._idle is not None:
+            await self._idle.wait()
+
+    def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    def _start(self) -> None:
+        if self._tasks:
+            return
+        # Created here, inside the running event loop
+        self._changed = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _channel_bucket(self, channel_id: int) -> TokenBucket:
+        bucket = self._channel_buckets.get(channel_id)
+        if bucket is None:
+            if len(self._channel_buckets) >= MAX_CHANNEL_BUCKETS:
+                # A full bucket behaves like a new one
+                self._channel_buckets = {
+                    key: value for key, value in self._channel_buckets.items()
+                    if value.delay(value.capacity) > 0
+                }
+            bucket = TokenBucket(self.channel_rate, self.channel_burst, self.monotonic)
+            self._channel_buckets[channel_id] = bucket
+        return bucket
+
+    def _wait(self, notification: Notification, delay: float) -> None:
+        heapq.heappush(self._waiting, (self.monotonic() + delay, next(self._counter), notification))
+        self._changed.set()
+
+    async def _next(self) -> Notification:
+        while True:
+            now = self.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, _, notification = heapq.heappop(self._waiting)
+                heapq.heappush(self._ready, (notification.priority, next(self._counter), notification))
+            if self._ready:
+                return heapq.heappop(self._ready)[2]
+
+            self._changed.clear()
+            timeout = self._waiting[0][0] - now if self._waiting else None
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            notification = await self._next()
+            self._in_flight += 1
+            try:
+                await self._dispatch(notification)
+            finally:
+                self._in_flight -= 1
+                if not self._ready and not self._waiting and not self._in_flight:
+                    self._idle.set()
+
+    async def _dispatch(self, notification: Notification) -> None:
+        if notification.expires_at is not None and self.clock() >= notification.expires_at:
+            NOTIFICATIONS.labels("expired").inc()
+            logging.warning(f"Dropped {notification.description}, its window closed before it could be sent")
+            return
+
+        if notification.prepare is not None and notification.prepared is None:
+            try:
+                notification.prepared = await notification.prepare()
+            except Exception as e:
+                self._failed(notification, e)
+                return
+
+        buckets = [self._channel_bucket(notification.channel_id)] if self.channel_rate else []
+        if self.global_bucket is not None:
+            buckets.append(self.global_bucket)
+        delay = max((bucket.delay() for bucket in buckets), default=0.0)
+        if delay > 0:
+            self._wait(notification, delay)
+            return
+        for bucket in buckets:
+            bucket.try_acquire()
+
+        start = time.perf_counter()
+        try:
+            if notification.prepare is not None:
+                await notification.send(notification.prepared)
+            else:
+                await notification.send()
+        except Exception as e:
+            NOTIFICATION_SEND_SECONDS.observe(time.perf_counter() - start)
+            self._failed(notification, e)
+            return
+
+        NOTIFICATION_SEND_SECONDS.observe(time.perf_counter() - start)
+        NOTIFICATIONS.labels("sent").inc()
+
+    def _failed(self, notification: Notification, error: Exception) -> None:
+        notification.attempts += 1
+        if notification.attempts <= self.retries and self.retryable(error):
+            NOTIFICATION_RETRIES.inc()
+            retry_after = getattr(error, "retry_after", None)
+            self._wait(notification, retry_after or self._backoff_delay(notification.attempts))
+            return
+        NOTIFICATIONS.labels("failed").inc()
+        logging.error(f"Failed to send {notification.description} after {notification.attempts} attempts: {error}")
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
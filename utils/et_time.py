@@ -1,19 +1,100 @@
 from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional
 from zoneinfo import ZoneInfo
 
-from models import GatheringReminder
+import numpy as np
+import time
 
 ET_MULTIPLIER = 3600 / 175
+ET_DAY_SECONDS = 86400
+
+# Eorzea time runs 3600/175 = 144/7 times faster than real time
+ET_NUMERATOR = 144
+ET_DENOMINATOR = 7
+ET_HOUR_MS = 3_600_000
+ET_DAY_MS = 24 * ET_HOUR_MS
+
+
+class EorzeaClock:
+    """
+    Maps real epoch time to Eorzea time and back with integer milliseconds,
+    so conversions are exact and never drift.
+
+    The time source is injectable (returns real epoch seconds). Evaluations
+    sample it once and pass that sample around instead of reading the wall
+    clock repeatedly.
+    """
+
+    def __init__(self, time_source: Callable[[], float] = time.time):
+        self.time_source = time_source
+
+    def now_ms(self) -> int:
+        return round(self.time_source() * 1000)
+
+    @staticmethod
+    def to_et_ms(real_ms: int) -> int:
+        return real_ms * ET_NUMERATOR // ET_DENOMINATOR
+
+    @staticmethod
+    def to_real_ms(et_ms: int) -> int:
+        # First real millisecond at or after this ET time
+        return -(-et_ms * ET_DENOMINATOR // ET_NUMERATOR)
+
+    def et_hour(self, real_ms: Optional[int] = None) -> int:
+        real_ms = self.now_ms() if real_ms is None else real_ms
+        return self.to_et_ms(real_ms) % ET_DAY_MS // ET_HOUR_MS
+
+    def next_spawn_ms(self, et_hours, after_ms: Optional[int] = None) -> int:
+        """
+        Real timestamp (ms) of the first spawn strictly after after_ms.
+        """
+        after_ms = self.now_ms() if after_ms is None else after_ms
+        et_after = self.to_et_ms(after_ms)
+        et_day_start = et_after - et_after % ET_DAY_MS
+
+        next_et = None
+        for hour in et_hours:
+            spawn_et = et_day_start + hour * ET_HOUR_MS
+            if spawn_et <= et_after:
+                spawn_et += ET_DAY_MS
+            if next_et is None or spawn_et < next_et:
+                next_et = spawn_et
+
+        return self.to_real_ms(next_et)
+
+    def window_end_ms(self, et_hours, duration_et_hours: int, at_ms: Optional[int] = None) -> Optional[int]:
+        """
+        Real timestamp (ms) at which the spawn window open at at_ms closes,
+        None when no window is open. Overlapping windows end with the latest one.
+        """
+        at_ms = self.now_ms() if at_ms is None else at_ms
+        et_now = self.to_et_ms(at_ms)
+        et_now_of_day = et_now % ET_DAY_MS
+        duration_et = duration_et_hours * ET_HOUR_MS
+
+        end_et = None
+        for hour in et_hours:
+            since_spawn = (et_now_of_day - hour * ET_HOUR_MS) % ET_DAY_MS
+            if since_spawn < duration_et:
+                candidate = et_now - since_spawn + duration_et
+                if end_et is None or candidate > end_et:
+                    end_et = candidate
+
+        return None if end_et is None else self.to_real_ms(end_et)
+
+
+CLOCK = EorzeaClock()
+
 
 def format_et_hours(et_hours: set[int]) -> str:
     return " & ".join(f"{h} ET" for h in et_hours)
 
-def _current_et_datetime():
-    now_real_ts = datetime.now(timezone.utc).timestamp()
-    current_et_ts = now_real_ts * ET_MULTIPLIER
+def _current_et_datetime(clock: Optional[EorzeaClock] = None):
+    clock = clock or CLOCK
+    current_et_ms = clock.to_et_ms(clock.now_ms())
 
     return datetime.fromtimestamp(
-        current_et_ts,
+        current_et_ms / 1000,
         tz=timezone.utc
     )
 
@@ -37,9 +118,10 @@ def _min_spawn_gap_real(et_hours: list[int]) -> float:
     min_gap_et = min(gaps_et)
     return min_gap_et / ET_MULTIPLIER
 
-def should_notify(reminder, user_timezone) -> bool:
-    now_real = datetime.now(user_timezone)
-    now_ts = now_real.timestamp()
+def should_notify(reminder, user_timezone, clock: Optional[EorzeaClock] = None) -> bool:
+    clock = clock or CLOCK
+    now_ms = clock.now_ms()
+    now_ts = now_ms / 1000
 
     # Don't fire if we already notified within the last ET day
     # (prevents double-firing on the same spawn)
@@ -54,17 +136,20 @@ def should_notify(reminder, user_timezone) -> bool:
             if now_ts - last_ts < min_gap * 0.9:
                 return False
 
-    # Check if any spawn is within alert_before_minutes (real time)
-    for et_hour in reminder.et_hours:
-        next_spawn = _et_to_datetime(et_hour, user_timezone)
-        seconds_until = (next_spawn - now_real).total_seconds()
-
-        alert_window_real = reminder.alert_before_minutes * 60
+    # Check if the next spawn is within alert_before_minutes (real time)
+    ms_until = clock.next_spawn_ms(reminder.et_hours, now_ms) - now_ms
+    return ms_until <= reminder.alert_before_minutes * 60_000
 
-        if 0 <= seconds_until <= alert_window_real:
-            return True
+def next_spawn_ts(et_hours, after_ts: float, clock: Optional[EorzeaClock] = None) -> float:
+    """
+    Real timestamp of the first spawn strictly after after_ts.
 
-    return False
+    :param et_hours: The ET hours the node spawns at.
+    :param after_ts: A real (epoch) timestamp.
+    :return: The real (epoch) timestamp of the next spawn.
+    """
+    clock = clock or CLOCK
+    return clock.next_spawn_ms(et_hours, round(after_ts * 1000)) / 1000
 
 def _discord_timestamp(timestamp: int) -> str:
     return f"<t:{timestamp}:R>"
@@ -73,85 +158,108 @@ def _et_hours_to_real_seconds(duration_et_hours: float) -> float:
     duration_et_seconds = duration_et_hours * 3600
     return duration_et_seconds / ET_MULTIPLIER
 
-def _et_to_datetime(target_hour, user_timezone: ZoneInfo):
-    now_real = datetime.now(user_timezone)
-    now_real_ts = now_real.timestamp()
-
-    current_et = _current_et_datetime()
-
-    target_et = current_et.replace(
-        hour=target_hour,
-        minute=0,
-        second=0,
-        microsecond=0
-    )
-
-    # If already passed today, move to next ET day
-    if target_et <= current_et:
-        target_et = datetime.fromtimestamp(
-            target_et.timestamp() + 86400,
-            tz=timezone.utc
-        )
+def _et_to_datetime(target_hour, user_timezone: ZoneInfo, clock: Optional[EorzeaClock] = None):
+    clock = clock or CLOCK
+    next_real_ms = clock.next_spawn_ms([target_hour])
+    return datetime.fromtimestamp(next_real_ms / 1000, tz=user_timezone)
 
-    # ET delta
-    et_delta_seconds = target_et.timestamp() - current_et.timestamp()
-
-    # Convert ET delta to real delta
-    real_delta_seconds = et_delta_seconds / ET_MULTIPLIER
-
-    # Next real timestamp
-    next_real_ts = now_real_ts + real_delta_seconds
-
-    return datetime.fromtimestamp(next_real_ts,tz=user_timezone)
-
-def _check_active(et_times: list[int], duration_et_hours: int):
+def _check_active(et_times: list[int], duration_et_hours: int, clock: Optional[EorzeaClock] = None):
     """
     Check whether any spawn window is currently active.
 
-    Returns a tuple of (is_active, remaining_real_timedelta | None).
+    Returns a tuple of (is_active, window_end_real_timestamp | None).
     """
-    current_et = _current_et_datetime()
-    duration_real_seconds = _et_hours_to_real_seconds(duration_et_hours)
-
-    for hour in et_times:
-        # Build the ET datetime for this spawn on the current ET day
-        spawn_et = current_et.replace(
-            hour=hour,
-            minute=0,
-            second=0,
-            microsecond=0
-        )
-
-        # Also consider the spawn from the *previous* ET day,
-        # in case we're inside a window that started before ET midnight
-        for candidate in (spawn_et, datetime.fromtimestamp(
-            spawn_et.timestamp() - 86400, tz=timezone.utc
-        )):
-            spawn_real_ts = candidate.timestamp() / ET_MULTIPLIER
-            end_real_ts = spawn_real_ts + duration_real_seconds
-            now_real_ts = datetime.now(timezone.utc).timestamp()
-
-            if spawn_real_ts <= now_real_ts < end_real_ts:
-                return True, int(end_real_ts)
-
-    return False, None
-
-def convert(et_times, duration_et_hours, user_timezone: ZoneInfo):
+    clock = clock or CLOCK
+    end_ms = clock.window_end_ms(et_times, duration_et_hours)
+    if end_ms is None:
+        return False, None
+    return True, end_ms // 1000
+
+def convert(et_times, duration_et_hours, user_timezone: ZoneInfo, clock: Optional[EorzeaClock] = None):
     if not isinstance(et_times, list):
         raise TypeError("et_times must be a list")
     if len(et_times) < 1 or len(et_times) > 2:
         raise ValueError("et_times must contain 1 or 2 ET hours")
 
-    is_active, end_time = _check_active(et_times, duration_et_hours)
+    clock = clock or CLOCK
+    now_ms = clock.now_ms()
 
-    if is_active:
-        return "Currently active", f"{_discord_timestamp(end_time)}"
+    end_ms = clock.window_end_ms(et_times, duration_et_hours, now_ms)
+    if end_ms is not None:
+        return format_spawn_status(end_ms, None, user_timezone)
+    return format_spawn_status(None, clock.next_spawn_ms(et_times, now_ms), user_timezone)
 
-    occurrences = [_et_to_datetime(hour, user_timezone) for hour in et_times]
-    next_occurrence = min(occurrences)
+def format_spawn_status(window_end_ms: Optional[int], next_spawn_ms: Optional[int], user_timezone: ZoneInfo):
+    """
+    The (status, detail) pair shown for a node, see convert.
+    window_end_ms is set while a window is open, next_spawn_ms otherwise.
+    """
+    if window_end_ms is not None:
+        return "Currently active", f"{_discord_timestamp(window_end_ms // 1000)}"
 
+    next_occurrence = datetime.fromtimestamp(next_spawn_ms / 1000, tz=user_timezone)
 
     return (
         next_occurrence.strftime("%H:%M:%S %Z"),
         f"Spawns {_discord_timestamp(int(next_occurrence.timestamp()))}"
     )
+
+
+class SpawnBatch(NamedTuple):
+    next_spawn_ts: np.ndarray
+    is_active: np.ndarray
+    window_end_ts: np.ndarray
+    is_due: Optional[np.ndarray]
+
+
+def pack_et_hours(et_hours_list) -> np.ndarray:
+    """
+    Pack ET hour lists of different lengths into a (n, k) array padded with -1.
+    """
+    width = max((len(et_hours) for et_hours in et_hours_list), default=1)
+    packed = np.full((len(et_hours_list), width), -1, dtype=np.int64)
+    for row, et_hours in enumerate(et_hours_list):
+        packed[row, :len(et_hours)] = et_hours
+    return packed
+
+
+def batch_spawns(
+        et_hours: np.ndarray,
+        duration_et_hours: np.ndarray,
+        now_ts: float,
+        lead_seconds: Optional[np.ndarray] = None) -> SpawnBatch:
+    """
+    Evaluate the spawn windows of many nodes or alerts against a single now.
+
+    :param et_hours: (n, k) ET spawn hours, padded with -1 (see pack_et_hours).
+    :param duration_et_hours: (n,) window durations in ET hours.
+    :param now_ts: The real (epoch) timestamp to evaluate at.
+    :param lead_seconds: Optional (n,) alert lead times in real seconds.
+    :return: For each row, the next spawn strictly after now, whether a window
+        is active, when the latest active window ends (NaN when inactive) and, with
+        lead_seconds, whether an alert is due (same rule as should_notify).
+    """
+    et_hours = np.asarray(et_hours)
+    valid = et_hours >= 0
+    et_now_of_day = (now_ts * ET_MULTIPLIER) % ET_DAY_SECONDS
+    spawn_of_day = et_hours * 3600.0
+
+    # ET seconds until each spawn, a spawn exactly at now counts as the next day one
+    until_spawn = (spawn_of_day - et_now_of_day) % ET_DAY_SECONDS
+    until_spawn[until_spawn == 0] = ET_DAY_SECONDS
+    until_spawn[~valid] = np.inf
+    next_spawn_ts = now_ts + until_spawn.min(axis=1) / ET_MULTIPLIER
+
+    # ET seconds since each spawn's latest occurrence
+    since_spawn = (et_now_of_day - spawn_of_day) % ET_DAY_SECONDS
+    duration = np.asarray(duration_et_hours, dtype=np.float64)[:, None] * 3600.0
+    active = valid & (since_spawn < duration)
+    is_active = active.any(axis=1)
+    remaining = np.where(active, duration - since_spawn, -np.inf).max(axis=1)
+    window_end_ts = np.where(is_active, now_ts + remaining / ET_MULTIPLIER, np.nan)
+
+    is_due = None
+    if lead_seconds is not None:
+        is_due = next_spawn_ts - now_ts <= np.asarray(lead_seconds)
+
+    return SpawnBatch(next_spawn_ts, is_active, window_end_ts, is_due)
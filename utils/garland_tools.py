@@ -1,17 +1,119 @@
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Callable, Optional
+from utils.compiled_catalog import CompiledCatalog, CompiledItemsById
 from utils.et_time import format_et_hours
+from utils.search_index import SearchIndex
+from utils.spawn_timeline import SpawnTimeline
 from models import GatheringItem, GatheringNode
+from urllib.parse import quote
 import json
+import os
 
 GATHERING_ITEMS_PATH = "gathering_items.json"
+COMPILED_CATALOG_PATH = "gathering_items.bin"
+
+# GarlandTools endpoints, relative to the HttpClient base url
+DATA_PATH = "db/doc/core/en/3/data.json"
+NODES_PATH = "db/doc/browse/en/2/node.json"
+
+
+def node_path(node_id: int) -> str:
+    return f"db/doc/node/en/2/{node_id}.json"
+
+
+def item_path(item_id: int) -> str:
+    return f"db/doc/item/en/3/{item_id}.json"
+
+
+def zone_map_path(zone_map: str) -> str:
+    return f"files/maps/{quote(zone_map)}.png"
+
+
+@dataclass
+class GatheringCatalog:
+    items: Sequence[GatheringItem]
+    items_by_id: Mapping[int, GatheringItem]
+    search_index: SearchIndex
+    timeline: SpawnTimeline
+    # Loads the description of an item id, for catalogs that don't keep them in memory
+    description_loader: Optional[Callable[[int], str]] = None
+    # Bumped on every reload, see GarlandCog.reload_catalog
+    version: int = 0
+
+    def describe(self, item: GatheringItem) -> str:
+        """
+        The description of an item, loaded but not stored on the item when the
+        catalog doesn't keep descriptions in memory.
+        """
+        if item.description is None:
+            return self.description_loader(item.id)
+        return item.description
+
+
+def catalog_mtimes(
+    path: str = GATHERING_ITEMS_PATH,
+    compiled_path: str = COMPILED_CATALOG_PATH,
+) -> tuple[Optional[float], Optional[float]]:
+    """
+    Modification times of the catalog files, None for a missing file.
+    Used to detect a catalog update.
+    """
+    mtimes = []
+    for file_path in (path, compiled_path):
+        try:
+            mtimes.append(os.path.getmtime(file_path))
+        except FileNotFoundError:
+            mtimes.append(None)
+    return mtimes[0], mtimes[1]
+
+
+def load_catalog(
+    path: str = GATHERING_ITEMS_PATH,
+    compiled_path: str = COMPILED_CATALOG_PATH,
+) -> GatheringCatalog:
+    """
+    Load the compiled catalog when there is one at least as recent as the JSON file.
+    """
+    try:
+        use_compiled = os.path.getmtime(compiled_path) >= os.path.getmtime(path)
+    except FileNotFoundError:
+        use_compiled = os.path.exists(compiled_path)
+
+    if use_compiled:
+        return load_compiled_catalog(compiled_path)
+    return load_gathering_items(path)
+
+
+def load_compiled_catalog(path: str = COMPILED_CATALOG_PATH) -> GatheringCatalog:
+    """
+    Open a catalog written by utils.compiled_catalog.write_compiled_catalog.
+    Items are only built when they are looked up.
+
+    Returns:
+        GatheringCatalog
+    """
+    compiled = CompiledCatalog(path)
+    names = [compiled.name_lower(position) for position in range(len(compiled))]
+    spawns = [compiled.spawn(position) for position in range(len(compiled))]
+
+    return GatheringCatalog(
+        items=compiled,
+        items_by_id=CompiledItemsById(compiled),
+        search_index=SearchIndex(compiled, names=names),
+        timeline=SpawnTimeline(compiled, spawns=spawns),
+        description_loader=compiled.description,
+    )
+
 
 def load_gathering_items(
     path: str = GATHERING_ITEMS_PATH,
-) -> tuple[list[GatheringItem], dict[int, GatheringItem]]:
+) -> GatheringCatalog:
     """
-    Load gathering items from JSON file.
+    Load gathering items from JSON file and build their indexes.
 
     Returns:
-        (items_list, items_by_id)
+        GatheringCatalog
     """
     with open(path, encoding="utf-8") as f:
         raw: list[dict] = json.load(f)
@@ -44,4 +146,9 @@ def load_gathering_items(
         items.append(item)
 
     items_by_id = {item.id: item for item in items}
-    return items, items_by_id
\ No newline at end of file
+    return GatheringCatalog(
+        items=items,
+        items_by_id=items_by_id,
+        search_index=SearchIndex(items),
+        timeline=SpawnTimeline(items),
+    )
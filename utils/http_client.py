@@ -0,0 +1,321 @@
+from typing import Optional
+from urllib.parse import urljoin, urlsplit
+from utils.metrics import REGISTRY
+from utils.rate_limit import TokenBucket
+from utils.single_flight import SingleFlight
+import aiohttp
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+GARLAND_TOOLS_URL = "https://www.garlandtools.org/"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Fixed so the validators and stale copies survive a restart, which matters
+# most when the restart happens during an upstream outage
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "panda_http")
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "pandabot_http_request_seconds", "Upstream request attempts by host and status (or error type)",
+    ("host", "status"),
+)
+HTTP_CACHE_RESULTS = REGISTRY.counter(
+    "pandabot_http_cache", "Cached fetches by result: fresh, revalidated (304), fetched or stale", ("result",)
+)
+
+
+class HttpError(Exception):
+    def __init__(self, url: str, status: Optional[int] = None, reason: str = ""):
+        self.url = url
+        self.status = status
+        detail = " ".join(str(part) for part in (status, reason) if part)
+        super().__init__(f"GET {url} failed: {detail}")
+
+
+class CircuitOpenError(HttpError):
+    def __init__(self, url: str):
+        super().__init__(url, reason="circuit open, upstream is failing")
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host after failure_threshold consecutive failures.
+    After reset_timeout seconds a single trial request is let through (half open),
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self._trial_running or self.clock() - self.opened_at < self.reset_timeout:
+            return False
+        self._trial_running = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+
+
+class ResponseCache:
+    """
+    On disk cache of response bodies with their validators (ETag / Last-Modified).
+    Bodies are stored as plain files so they can be opened by path.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def body_path(self, url: str) -> str:
+        path = urlsplit(url).path
+        extension = os.path.splitext(path)[1]
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}{extension}")
+
+    def load_meta(self, url: str) -> Optional[dict]:
+        try:
+            with open(f"{self.body_path(url)}.meta", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not os.path.exists(self.body_path(url)):
+            return None
+        return meta
+
+    def store(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]) -> None:
+        path = self.body_path(url)
+        self._atomic_write(path, body)
+        self._write_meta(url, {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        })
+
+    def touch(self, url: str, meta: dict) -> None:
+        meta["fetched_at"] = time.time()
+        self._write_meta(url, meta)
+
+    def _write_meta(self, url: str, meta: dict) -> None:
+        self._atomic_write(f"{self.body_path(url)}.meta", json.dumps(meta).encode("utf-8"))
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        # Per process, shard processes may share the cache directory
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class HttpClient:
+    """
+    Shared async HTTP client for garlandtools.org.
+
+    - one keep-alive connection pool, limited per host
+    - timeouts, retries with jittered exponential backoff
+    - a circuit breaker per host
+    - cached responses are revalidated with ETag / Last-Modified, and served
+      stale when the upstream is failing
+    - an optional token bucket shared by every request
+
+    base_url can point to a local stub server.
+    """
+
+    def __init__(
+            self,
+            base_url: str = GARLAND_TOOLS_URL,
+            cache_dir: Optional[str] = None,
+            timeout: float = 10.0,
+            max_connections: int = 20,
+            per_host_limit: int = 4,
+            retries: int = 3,
+            backoff: float = 0.5,
+            failure_threshold: int = 5,
+            reset_timeout: float = 30.0,
+            rate_limiter: Optional[TokenBucket] = None,
+    ):
+        self.base_url = base_url
+        self.cache = ResponseCache(cache_dir)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.rate_limiter = rate_limiter
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._single_flight = SingleFlight()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def url(self, path: str) -> str:
+        return urljoin(self.base_url, path)
+
+    async def get_file(self, path: str, max_age: Optional[float] = None) -> str:
+        """
+        Fetch a resource into the response cache and return the local file.
+
+        :param path: The path relative to base_url.
+        :param max_age: Seconds during which a cached copy is used without revalidation.
+        :return: The path of the cached body.
+        """
+        url = self.url(path)
+        return await self._single_flight.do(url, lambda: self._fetch_cached(url, max_age))
+
+    async def get(self, path: str, max_age: Optional[float] = None) -> bytes:
+        body_path = await self.get_file(path, max_age)
+        with open(body_path, "rb") as f:
+            return f.read()
+
+    async def get_json(self, path: str, max_age: Optional[float] = None):
+        return json.loads(await self.get(path, max_age))
+
+    async def _fetch_cached(self, url: str, max_age: Optional[float]) -> str:
+        body_path = self.cache.body_path(url)
+        meta = self.cache.load_meta(url)
+
+        if meta and max_age is not None and time.time() - meta["fetched_at"] < max_age:
+            HTTP_CACHE_RESULTS.labels("fresh").inc()
+            return body_path
+
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            status, response_headers, body = await self.request(url, headers)
+        except HttpError as e:
+            if meta is None:
+                raise
+            logging.warning(f"Serving stale {url}: {e}")
+            HTTP_CACHE_RESULTS.labels("stale").inc()
+            return body_path
+
+        if status == 304:
+            if meta is None:
+                # Nothing was sent to revalidate, don't store the empty body as the resource
+                raise HttpError(url, status, "Not Modified without a cached copy")
+            HTTP_CACHE_RESULTS.labels("revalidated").inc()
+            self.cache.touch(url, meta)
+        else:
+            HTTP_CACHE_RESULTS.labels("fetched").inc()
+            self.cache.store(url, body, response_headers.get("ETag"), response_headers.get("Last-Modified"))
+
+        return body_path
+
+    async def request(self, url: str, headers: Optional[dict] = None):
+        """
+        GET a url with retries, returns (status, headers, body).
+        Raises HttpError once the retries are exhausted or on a non retryable status.
+        """
+        host = urlsplit(url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            self._breakers[host] = breaker
+
+        # Half open, this request is the trial
+        is_trial = breaker.is_open
+        if not breaker.allow():
+            raise CircuitOpenError(url)
+
+        session = self._get_session()
+        error = HttpError(url)
+        settled = False
+        try:
+            for attempt in range(self.retries + 1):
+                retry_after = None
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                start = time.perf_counter()
+                try:
+                    async with session.get(url, headers=headers) as response:
+                        if response.status < 400:
+                            body = await response.read()
+                            HTTP_REQUEST_SECONDS.labels(host, response.status).observe(time.perf_counter() - start)
+                            settled = True
+                            breaker.record_success()
+                            return response.status, response.headers, body
+
+                        HTTP_REQUEST_SECONDS.labels(host, response.status).observe(time.perf_counter() - start)
+                        error = HttpError(url, response.status, response.reason or "")
+                        if response.status not in RETRY_STATUSES:
+                            # The host answered, it is not failing
+                            settled = True
+                            breaker.record_success()
+                            raise error
+                        retry_after = response.headers.get("Retry-After")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    HTTP_REQUEST_SECONDS.labels(host, type(e).__name__).observe(time.perf_counter() - start)
+                    error = HttpError(url, reason=type(e).__name__)
+
+                if attempt < self.retries:
+                    await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+
+            settled = True
+            breaker.record_failure()
+            raise error
+        finally:
+            if is_trial and not settled:
+                # Cancelled or an unexpected error, the circuit would otherwise
+                # wait for this trial forever
+                breaker.record_failure()
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 30.0)
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # The session has to be created from within the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    limit_per_host=self.per_host_limit,
+                    keepalive_timeout=60,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
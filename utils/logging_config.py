@@ -1,16 +1,159 @@
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Optional
+from discord import app_commands
+import copy
+import discord
+import json
 import logging
+import queue
+import uuid
 
-def init_logging(level=logging.INFO):
-    level = logging.ERROR
-    log_format = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
-
-    logging.basicConfig(
-        level=level,
-        format=log_format,
-        datefmt=date_format,
-        handlers=[
-            logging.StreamHandler(),  # console
-            logging.FileHandler("app.log", encoding="utf-8")  # file
-        ]
-    )
\ No newline at end of file
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s [%(correlation_id)s]: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Id of the command (or loop tick) being handled, added to every record logged meanwhile
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+_listener: Optional[QueueListener] = None
+_traceback_formatter = logging.Formatter()
+
+
+def new_correlation_id(prefix: str = "") -> str:
+    """
+    Set a fresh correlation id in the current context, e.g. at the start of a
+    loop tick. Tasks created afterwards inherit it.
+    """
+    value = f"{prefix}{uuid.uuid4().hex[:12]}"
+    correlation_id.set(value)
+    return value
+
+
+class CorrelationFilter(logging.Filter):
+    """
+    Copy the correlation id onto the record. Runs in the emitting task,
+    before the record is handed over to the listener thread.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "correlation_id", "-") != "-":
+            entry["correlation_id"] = record.correlation_id
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like QueueHandler.prepare (merge the args, drop what can't be pickled) but keeps
+        # the traceback apart from the message so the listener side formatters place it
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class CorrelatedCommandTree(app_commands.CommandTree):
+    """
+    Command tree giving every application command its own correlation id,
+    set before the command runs so all its logs carry it.
+    """
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        correlation_id.set(f"{interaction.id:x}")
+        return True
+
+
+def init_logging(
+        level=logging.INFO,
+        log_file: Optional[str] = "app.log",
+        json_lines: bool = False,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        rotate_when: Optional[str] = None,
+) -> QueueListener:
+    """
+    Log through a queue: the loggers only enqueue records, a listener thread
+    formats them and writes to the console and the log file.
+
+    :param level: A level number or name, e.g. "INFO".
+    :param log_file: The log file, None to log to the console only.
+    :param json_lines: Write the file as JSON lines instead of text.
+    :param max_bytes: Rotate the file once it reaches this size.
+    :param backup_count: Number of rotated files to keep.
+    :param rotate_when: Rotate on time instead of size, e.g. "midnight" (see TimedRotatingFileHandler).
+    :return: The listener, stopped by shutdown_logging.
+    """
+    global _listener
+    shutdown_logging()
+
+    if isinstance(level, str):
+        name = level
+        level = logging.getLevelName(name.upper())
+        if not isinstance(level, int):
+            raise ValueError(f"Unknown log level {name}")
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+    handlers: list[logging.Handler] = [console]
+
+    if log_file:
+        if rotate_when:
+            file_handler = TimedRotatingFileHandler(
+                log_file, when=rotate_when, backupCount=backup_count, encoding="utf-8"
+            )
+        else:
+            file_handler = RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+        file_handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+        handlers.append(file_handler)
+
+    # Unbounded, a burst of records never blocks the event loop
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """
+    Write the queued records and stop the listener thread.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
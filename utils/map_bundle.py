@@ -0,0 +1,92 @@
+from typing import Optional
+import mmap
+import os
+import struct
+
+# File layout:
+#   header  : magic, format version, entry count
+#   index   : one (key length, key, offset, length) record per entry
+#   blobs   : the rendered images, back to back
+BUNDLE_MAGIC = b"PMAP"
+BUNDLE_VERSION = 1
+_HEADER = struct.Struct("<4sHI")
+_ENTRY = struct.Struct("<H")
+_LOCATION = struct.Struct("<QI")
+
+
+def write_bundle(path: str, renders: dict[str, bytes]) -> None:
+    """
+    Write pre-rendered maps to a bundle file.
+
+    :param path: The bundle file to write.
+    :param renders: The image bytes keyed by render key (see utils.map_cache.render_key).
+    """
+    keys = sorted(renders)
+    encoded_keys = [key.encode("utf-8") for key in keys]
+
+    index_size = sum(_ENTRY.size + len(key) + _LOCATION.size for key in encoded_keys)
+    offset = _HEADER.size + index_size
+
+    index = bytearray()
+    for key, encoded_key in zip(keys, encoded_keys):
+        length = len(renders[key])
+        index += _ENTRY.pack(len(encoded_key)) + encoded_key + _LOCATION.pack(offset, length)
+        offset += length
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(keys)))
+        f.write(index)
+        for key in keys:
+            f.write(renders[key])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MapBundle:
+    """
+    Read only view of a bundle written by write_bundle. The file is memory
+    mapped and get() returns slices of the mapping without copying.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._index = self._read_index()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, key: str) -> Optional[memoryview]:
+        location = self._index.get(key)
+        if location is None:
+            return None
+        offset, length = location
+        return self._view[offset:offset + length]
+
+    def close(self) -> None:
+        self._view.release()
+        self._mmap.close()
+
+    def _read_index(self) -> dict[str, tuple[int, int]]:
+        magic, version, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"{self.path} is not a version {BUNDLE_VERSION} map bundle")
+
+        index = {}
+        position = _HEADER.size
+        for _ in range(count):
+            (key_length,) = _ENTRY.unpack_from(self._mmap, position)
+            position += _ENTRY.size
+            key = bytes(self._mmap[position:position + key_length]).decode("utf-8")
+            position += key_length
+            index[key] = _LOCATION.unpack_from(self._mmap, position)
+            position += _LOCATION.size
+
+        return index
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from utils.metrics import CACHE_REQUESTS
+from utils.single_flight import SingleFlight
+import hashlib
+import logging
+import os
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by a byte budget instead of an entry count.
+    Lookups are counted in CACHE_REQUESTS under name.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = len, name: str = "lru"):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.name = name
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._hit_counter = CACHE_REQUESTS.labels(name, "hit")
+        self._miss_counter = CACHE_REQUESTS.labels(name, "miss")
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            self._miss_counter.inc()
+            return None
+
+        self.hits += 1
+        self._hit_counter.inc()
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            # Never let a single oversized value flush the whole cache
+            return
+
+        self.pop(key)
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.current_bytes -= entry[1]
+        return entry[0]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+
+
+def render_key(node_id: int, map_path: str, coordinates, zone_name: str, style: str = "") -> str:
+    """
+    Key of a finished render. The node id comes first, the digest guards
+    against serving an old render after the node data or the style (see
+    MapStyle.key) changed.
+    """
+    fingerprint = f"{map_path}|{coordinates[0]},{coordinates[1]}|{zone_name}|{style}"
+    digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:10]
+    return f"{node_id}-{digest}"
+
+
+class MapCache:
+    """
+    Cache for finished zone map renders, keyed by node (see render_key) with an
+    LRU bounded by a byte budget. Base maps, decoded and downscaled, are cached
+    in the render workers (see utils.map_render) and raw maps by the HTTP client.
+
+    When disk_dir is set, renders are also written there so they survive a restart.
+    Concurrent requests for the same key share a single render.
+    """
+
+    def __init__(
+            self,
+            render_budget: int = 64 * 1024 * 1024,
+            disk_dir: Optional[str] = None,
+    ):
+        self.renders = LRUCache(render_budget, name="renders")
+        self.disk_dir = disk_dir
+        self._single_flight = SingleFlight()
+
+        if disk_dir:
+            os.makedirs(os.path.join(disk_dir, "renders"), exist_ok=True)
+
+    async def get_render(self, key: str, renderer: Callable[[], Awaitable[bytes]], extension: str = "jpg") -> bytes:
+        """
+        :param extension: Of the file on disk, the format of the render.
+        """
+        data = self.renders.get(key)
+        if data is not None:
+            return data
+
+        async def load():
+            cached = self._read_disk(f"{key}.{extension}")
+            if self.disk_dir:
+                CACHE_REQUESTS.labels("renders_disk", "miss" if cached is None else "hit").inc()
+            if cached is None:
+                cached = await renderer()
+                self._write_disk(f"{key}.{extension}", cached)
+            self.renders.put(key, cached)
+            return cached
+
+        return await self._single_flight.do(key, load)
+
+    def clear(self) -> None:
+        self.renders.clear()
+
+    def _read_disk(self, filename: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(os.path.join(self.disk_dir, "renders", filename), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.error(f"Failed to read map cache file {filename}: {e}")
+            return None
+
+    def _write_disk(self, filename: str, data: bytes) -> None:
+        if not self.disk_dir:
+            return
+        path = os.path.join(self.disk_dir, "renders", filename)
+        # Per process, shard processes may share the cache directory
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Failed to write map cache file {path}: {e}")
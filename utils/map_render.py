@@ -0,0 +1,277 @@
+from PIL import Image, ImageDraw, ImageFont, features
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Mapping, Optional
+from utils.map_cache import LRUCache
+import functools
+import logging
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# Side of the GarlandTools zone maps, in pixels
+MAP_SIZE = 2048
+
+# Encoder quality of each preset, the scales of the formats don't match
+QUALITY_PRESETS = {
+    "jpeg": {"low": 60, "medium": 75, "high": 90},
+    "webp": {"low": 50, "medium": 70, "high": 85},
+    "avif": {"low": 40, "medium": 55, "high": 70},
+}
+_PIL_FORMATS = {"jpeg": "JPEG", "webp": "WEBP", "avif": "AVIF"}
+# Encoder effort, a notch faster than the Pillow defaults for a slightly larger file
+_ENCODER_OPTIONS = {"jpeg": {}, "webp": {"method": 2}, "avif": {"speed": 8}}
+_EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "avif": "avif"}
+
+
+@dataclass(frozen=True)
+class MapStyle:
+    """
+    How the zone maps are rendered, build it with map_style.
+
+    :param format: jpeg, webp or avif.
+    :param quality: Encoder quality, from 1 to 100.
+    :param crop: Side of the square kept around the node, in base map pixels. None keeps the whole map.
+    :param max_size: Longest side of the image, in pixels.
+    """
+    format: str = "jpeg"
+    quality: int = QUALITY_PRESETS["jpeg"]["medium"]
+    crop: Optional[int] = None
+    max_size: int = 1200
+
+    @property
+    def extension(self) -> str:
+        return _EXTENSIONS[self.format]
+
+    @property
+    def filename(self) -> str:
+        return f"map.{self.extension}"
+
+    @property
+    def key(self) -> str:
+        """
+        Identifies the style in the render keys, renders of another style never match.
+        """
+        return f"{self.format}-q{self.quality}-c{self.crop or 0}-s{self.max_size}"
+
+
+def map_style(format: str = "jpeg", quality: str | int = "medium", crop: Optional[int] = None,
+              max_size: int = 1200) -> MapStyle:
+    """
+    Build a MapStyle. Falls back to JPEG when this Pillow build can't encode
+    format, e.g. AVIF before Pillow 11.2.
+
+    :param quality: A preset of QUALITY_PRESETS (low, medium, high) or a number from 1 to 100.
+    """
+    format = format.lower()
+    if format == "jpg":
+        format = "jpeg"
+    if format not in QUALITY_PRESETS:
+        raise ValueError(f"Unknown map format {format}, expected one of {', '.join(QUALITY_PRESETS)}")
+    if format != "jpeg" and not features.check(format):
+        logging.warning(f"This Pillow build can't encode {format}, rendering the maps as JPEG")
+        format = "jpeg"
+
+    presets = QUALITY_PRESETS[format]
+    if quality in presets:
+        encoder_quality = presets[quality]
+    elif str(quality).isdigit() and 1 <= int(quality) <= 100:
+        encoder_quality = int(quality)
+    else:
+        raise ValueError(f"Map quality must be one of {', '.join(presets)} or from 1 to 100, got {quality}")
+    if crop is not None and crop <= 0:
+        crop = None
+    return MapStyle(format, encoder_quality, crop, max_size)
+
+
+def map_style_from_env(environ: Mapping[str, str] = os.environ) -> MapStyle:
+    """
+    The MapStyle set by MAP_FORMAT, MAP_QUALITY, MAP_CROP and MAP_MAX_SIZE.
+    """
+    return map_style(
+        environ.get("MAP_FORMAT", "jpeg"),
+        environ.get("MAP_QUALITY", "medium"),
+        int(environ.get("MAP_CROP", "0")),
+        int(environ.get("MAP_MAX_SIZE", "1200")),
+    )
+
+
+# Decoded base maps of this process, already downscaled, keyed by (map file, mtime, size)
+_base_maps = LRUCache(256 * 1024 * 1024, sizeof=lambda image: image.width * image.height * 4, name="base_maps")
+
+
+def init_worker(base_map_budget: int) -> None:
+    """
+    Initializer of the render worker processes.
+    """
+    global _base_maps
+    _base_maps = LRUCache(base_map_budget, sizeof=lambda image: image.width * image.height * 4, name="base_maps")
+
+
+@functools.cache
+def _load_font(size: int):
+    try:
+        return ImageFont.truetype(
+            os.path.join(BASE_DIR, "assets", "Roboto-Black.ttf"),
+            size
+        )
+    except OSError:
+        print("font not found")
+        return ImageFont.load_default()
+
+
+def ffxiv_to_pixels(x, y, map_size=2048):
+
+    scale = map_size / 45
+
+    pixel_x = (x * scale) - 8.0
+    pixel_y = (y * scale) + 18.0
+
+    return int(pixel_x), int(pixel_y)
+
+
+def _open_base_map(map_file: str, scale: float) -> Image.Image:
+    key = (map_file, os.stat(map_file).st_mtime_ns, scale)
+    base_map = _base_maps.get(key)
+    if base_map is None:
+        with Image.open(map_file) as image:
+            base_map = image.convert("RGBA")
+        if scale < 1:
+            # Once per map, every render then draws and encodes the small version
+            size = (max(1, round(base_map.width * scale)), max(1, round(base_map.height * scale)))
+            base_map = base_map.resize(size, Image.Resampling.LANCZOS)
+        _base_maps.put(key, base_map)
+    return base_map
+
+
+def render_zone_map(map_file: str, coordinates: tuple[float, float], zone_name: str,
+                    style: MapStyle = MapStyle()) -> bytes:
+    """
+    Draw the zone name, the coordinates and the node marker on a map.
+    Only takes plain values so it can run in a worker process.
+
+    :param map_file: Path of the raw map PNG.
+    :param coordinates: The in game (x, y) coordinates of the node.
+    :param zone_name: The zone name displayed in the top left corner.
+    :param style: The crop, size and encoding of the image.
+    :return: The image, encoded in the format of the style.
+    """
+    # Draw straight at the output size, on a base map downscaled once
+    region = style.crop or MAP_SIZE
+    scale = min(1.0, style.max_size / region)
+    base_map = _open_base_map(map_file, scale)
+
+    # -----------------------------
+    # Convert coordinates
+    # -----------------------------
+    x, y = ffxiv_to_pixels(coordinates[0], coordinates[1])
+    x, y = int(x * scale), int(y * scale)
+
+    # -----------------------------
+    # Crop around the node
+    # -----------------------------
+    if style.crop:
+        side = min(round(style.crop * scale), base_map.width, base_map.height)
+        # Kept inside the map, the node is off center near an edge
+        left = min(max(0, x - side // 2), base_map.width - side)
+        top = min(max(0, y - side // 2), base_map.height - side)
+        map_image = base_map.crop((left, top, left + side, top + side))
+        x, y = x - left, y - top
+    else:
+        # The cached base map is shared, always draw on a copy
+        map_image = base_map.copy()
+
+    draw = ImageDraw.Draw(map_image)
+
+    # -----------------------------
+    # Font (safe fallback)
+    # -----------------------------
+    # The labels keep the same share of the image whatever its size
+    text_scale = 3.0 * max(map_image.size) / MAP_SIZE
+    font = _load_font(max(8, int(28 * text_scale)))
+
+    text_coord = f"{coordinates[0]},{coordinates[1]}"
+
+    # -----------------------------
+    # Text size calculation (correct font!)
+    # -----------------------------
+    bbox = draw.textbbox((0, 0), zone_name, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    bbox_coord = draw.textbbox((0, 0), text_coord, font=font)
+    text_width_coord = bbox_coord[2] - bbox_coord[0]
+    text_height_coord = bbox_coord[3] - bbox_coord[1]
+
+    img_width, img_height = map_image.size
+
+    padding = int(10 * text_scale)
+    margin = max(1, round(10 * text_scale / 3))
+
+    box_x1 = margin
+    box_y1 = margin
+    box_x2 = box_x1 + text_width + padding * 2
+    box_y2 = box_y1 + text_height + padding
+
+    box_x2_coord = img_width - margin
+    box_y1_coord = margin
+    box_x1_coord = box_x2_coord - text_width_coord - padding * 2
+    box_y2_coord = box_y1_coord + text_height_coord + padding
+
+    # -----------------------------
+    # Background box (once)
+    # -----------------------------
+    draw.rounded_rectangle(
+        (box_x1, box_y1, box_x2, box_y2),
+        radius=margin,
+        fill=(0, 0, 0, 200)
+    )
+
+    draw.rounded_rectangle(
+        (box_x1_coord, box_y1_coord, box_x2_coord, box_y2_coord),
+        radius=margin,
+        fill=(0, 0, 0, 200)
+    )
+
+    draw.text(
+        (box_x1_coord + padding, box_y1_coord),
+        text_coord,
+        font=font,
+        fill=(255, 255, 255, 255)
+    )
+
+    # -----------------------------
+    # Text
+    # -----------------------------
+    draw.text(
+        (box_x1 + padding, box_y1),
+        zone_name,
+        font=font,
+        fill=(255, 255, 255, 255)
+    )
+
+    # -----------------------------
+    # Node marker (dot)
+    # -----------------------------
+    radius = max(4, round(35 * scale))
+
+    draw.ellipse(
+        (
+            x - radius,
+            y - radius,
+            x + radius,
+            y + radius
+        ),
+        fill=(255, 0, 0, 255),
+        outline=(255, 255, 255, 255),
+        width=max(1, round(10 * scale))
+    )
+
+    output = BytesIO()
+    map_image.thumbnail((style.max_size, style.max_size))
+    rgb_image = map_image.convert("RGB")
+    rgb_image.save(
+        output, format=_PIL_FORMATS[style.format], quality=style.quality, **_ENCODER_OPTIONS[style.format]
+    )
+
+    return output.getvalue()
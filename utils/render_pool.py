@@ -0,0 +1,36 @@
+from concurrent.futures import ProcessPoolExecutor
+from utils.map_render import MapStyle, init_worker, render_zone_map
+from utils.metrics import REGISTRY
+import asyncio
+import multiprocessing
+
+RENDER_SECONDS = REGISTRY.histogram(
+    "pandabot_map_render_seconds", "Zone map renders, including the wait for a free worker"
+)
+
+
+class RenderPool:
+    """
+    Runs the map renders (decode, draw, thumbnail, encode) in worker processes
+    so they never block the event loop.
+    """
+
+    def __init__(self, max_workers: int | None = None, base_map_budget: int = 256 * 1024 * 1024):
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            # Don't fork the running bot (event loop, gateway threads) into the workers
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(base_map_budget,),
+        )
+
+    async def render(self, map_file: str, coordinates: tuple[float, float], zone_name: str,
+                     style: MapStyle = MapStyle()) -> bytes:
+        loop = asyncio.get_running_loop()
+        with RENDER_SECONDS.time():
+            return await loop.run_in_executor(
+                self.executor, render_zone_map, map_file, coordinates, zone_name, style
+            )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,98 @@
+from typing import Callable, Hashable, Optional
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class DueQueue:
+    """
+    Min-heap of keys ordered by due timestamp.
+
+    Rescheduling or removing a key only updates the entry table, outdated heap
+    entries are skipped when they reach the top.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._entries: dict[Hashable, tuple[float, int]] = {}
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def schedule(self, key: Hashable, due_ts: float) -> None:
+        entry = (due_ts, next(self._counter))
+        self._entries[key] = entry
+        heapq.heappush(self._heap, (*entry, key))
+        self._changed.set()
+
+        # Don't let outdated entries pile up when keys are rescheduled a lot
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact()
+
+    def remove(self, key: Hashable) -> None:
+        if self._entries.pop(key, None) is not None:
+            self._changed.set()
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._entries.clear()
+        self._changed.set()
+
+    def wake(self) -> None:
+        """
+        Make wait() compute its deadline again, e.g. after the clock jumped.
+        """
+        self._changed.set()
+
+    def due_ts(self, key: Hashable) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            due_ts, counter, key = self._heap[0]
+            if self._entries.get(key) == (due_ts, counter):
+                return due_ts
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: Optional[float] = None) -> list[Hashable]:
+        """
+        Remove and return every key due at now, earliest first.
+        """
+        now = self.clock() if now is None else now
+        due = []
+        while True:
+            due_ts = self.next_due()
+            if due_ts is None or due_ts > now:
+                return due
+            _, _, key = heapq.heappop(self._heap)
+            del self._entries[key]
+            due.append(key)
+
+    async def wait(self, max_sleep: float = 3600.0) -> None:
+        """
+        Sleep until the earliest key is due, waking up early when the queue changes.
+        """
+        while True:
+            self._changed.clear()
+            due_ts = self.next_due()
+            delay = max_sleep if due_ts is None else due_ts - self.clock()
+            if delay <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=min(delay, max_sleep))
+            except asyncio.TimeoutError:
+                if due_ts is not None and due_ts <= self.clock():
+                    return
+
+    def _compact(self) -> None:
+        self._heap = [(*entry, key) for key, entry in self._entries.items()]
+        heapq.heapify(self._heap)
@@ -0,0 +1,236 @@
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from collections.abc import Sequence
+from typing import Optional
+from models import GatheringItem
+import re
+
+# Relevance tiers, lower ranks first
+EXACT = 0
+PREFIX = 1
+WORD_PREFIX = 2
+SUBSTRING = 3
+FUZZY = 4
+
+_WORD_SPLIT = re.compile(r"[^\w']+")
+
+# Typo tolerant matching only runs when the other tiers found at most this
+# many items, it is the slow part of a search
+FUZZY_MAX_MATCHES = 0
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _prefix_trigrams(word: str) -> set[str]:
+    # Only padded at the start, a partially typed word shares these with the full word
+    padded = f"  {word}"
+    return {padded[i:i + 3] for i in range(len(word))}
+
+
+def _prefix_edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Smallest optimal string alignment distance (Levenshtein + transpositions)
+    between a and any prefix of b, so a partially typed word still matches.
+    Gives up early once the distance is above max_distance.
+    """
+    # Characters of b past this point can only add edits
+    b = b[:len(a) + max_distance]
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+
+    return min(previous)
+
+
+class SearchIndex:
+    """
+    Ranked name search over the gathering items, used by the autocompletes.
+
+    Results are ordered by relevance: exact match, name prefix, word prefix,
+    substring and then typo tolerant fuzzy matches, searched only when nothing
+    else matched. Inside a tier shorter names come first. Recent query results
+    are kept in a small LRU.
+
+    names (the lowercase item names) can be given to index a lazily loaded
+    catalog without building its items.
+    """
+
+    def __init__(
+            self,
+            items: Sequence[GatheringItem],
+            cache_size: int = 512,
+            names: Optional[Sequence[str]] = None,
+    ):
+        self.items = items
+        self.names = names if names is not None else [item.name_lower for item in items]
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, int], list[GatheringItem]] = OrderedDict()
+        self._similar_cache: dict[str, list[str]] = {}
+
+        self._names: list[tuple[str, int]] = []
+        self._words: list[tuple[str, int]] = []
+        self._trigrams: dict[str, set[int]] = defaultdict(set)
+        # Distinct words of all the names, used by the fuzzy matching
+        self._vocabulary: dict[str, set[int]] = defaultdict(set)
+        self._word_trigrams: dict[str, set[str]] = defaultdict(set)
+
+        for position, name in enumerate(self.names):
+            self._names.append((name, position))
+            for word in self._split_words(name):
+                self._words.append((word, position))
+                self._vocabulary[word].add(position)
+            for trigram in _trigrams(name):
+                self._trigrams[trigram].add(position)
+
+        for word in self._vocabulary:
+            for trigram in _prefix_trigrams(word):
+                self._word_trigrams[trigram].add(word)
+
+        self._names.sort()
+        self._words.sort()
+        self._by_name = {name: position for name, position in reversed(self._names)}
+
+    def search(self, query: str, limit: int = 25) -> list[GatheringItem]:
+        query = " ".join(self._split_words(query.lower()))
+        key = (query, limit)
+
+        results = self._cache.get(key)
+        if results is not None:
+            self._cache.move_to_end(key)
+            return results
+
+        results = [self.items[position] for position in self._ranked(query, limit)]
+
+        self._cache[key] = results
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return results
+
+    def _ranked(self, query: str, limit: int) -> list[int]:
+        if not query:
+            return [position for _, position in self._names[:limit]]
+
+        ranks: dict[int, int] = {}
+
+        def add(position: int, rank: int) -> None:
+            if rank < ranks.get(position, FUZZY + 1):
+                ranks[position] = rank
+
+        exact = self._by_name.get(query)
+        if exact is not None:
+            add(exact, EXACT)
+
+        for position in self._prefixed(self._names, query):
+            add(position, PREFIX)
+
+        # Every word of the query has to start a word of the name
+        query_words = query.split(" ")
+        word_matches = None
+        for word in query_words:
+            matches = set(self._prefixed(self._words, word))
+            word_matches = matches if word_matches is None else word_matches & matches
+        for position in word_matches or ():
+            add(position, WORD_PREFIX)
+
+        if len(query) >= 3:
+            for position in self._substring(query):
+                add(position, SUBSTRING)
+
+        if len(ranks) <= FUZZY_MAX_MATCHES and len(query) >= 3:
+            for position in self._fuzzy(query_words):
+                add(position, FUZZY)
+
+        ordered = sorted(ranks, key=lambda p: (ranks[p], len(self.names[p]), self.names[p]))
+        return ordered[:limit]
+
+    @staticmethod
+    def _split_words(text: str) -> list[str]:
+        return [word for word in _WORD_SPLIT.split(text) if word]
+
+    @staticmethod
+    def _prefixed(entries: list[tuple[str, int]], prefix: str):
+        start = bisect_left(entries, (prefix,))
+        for i in range(start, len(entries)):
+            text, position = entries[i]
+            if not text.startswith(prefix):
+                break
+            yield position
+
+    def _substring(self, query: str) -> set[int]:
+        candidates = None
+        for i in range(len(query) - 2):
+            postings = self._trigrams.get(query[i:i + 3])
+            if not postings:
+                return set()
+            candidates = set(postings) if candidates is None else candidates & postings
+        return {position for position in candidates if query in self.names[position]}
+
+    def _fuzzy(self, query_words: list[str]) -> set[int]:
+        """
+        Items whose name has, for every query word, a word starting with it
+        up to a typo or two. Query words that start a word as typed are taken
+        as they are, only the others are looked up by edit distance.
+        """
+        matches = None
+        for query_word in query_words:
+            word_matches = set(self._prefixed(self._words, query_word))
+            if not word_matches:
+                for word in self._similar_words(query_word):
+                    word_matches |= self._vocabulary[word]
+
+            matches = word_matches if matches is None else matches & word_matches
+            if not matches:
+                return set()
+
+        return matches
+
+    def _similar_words(self, query_word: str) -> list[str]:
+        similar = self._similar_cache.get(query_word)
+        if similar is None:
+            similar = self._find_similar_words(query_word)
+            if len(self._similar_cache) >= self.cache_size:
+                self._similar_cache.clear()
+            self._similar_cache[query_word] = similar
+        return similar
+
+    def _find_similar_words(self, query_word: str) -> list[str]:
+        if len(query_word) < 3:
+            return [word for word, _ in self._prefixed_words(query_word)]
+
+        max_distance = 1 if len(query_word) <= 7 else 2
+        trigrams = _prefix_trigrams(query_word)
+
+        # Each edit changes at most 3 trigrams, skip words that can't be close enough
+        shared: dict[str, int] = defaultdict(int)
+        for trigram in trigrams:
+            for word in self._word_trigrams.get(trigram, ()):
+                shared[word] += 1
+        min_shared = len(trigrams) - 3 * max_distance
+
+        # Typos are rare on the first letter, requiring it keeps e.g. "aether"
+        # away from "ethereal" and "feather"
+        return [
+            word for word, count in shared.items()
+            if count >= min_shared and word[0] == query_word[0]
+            and _prefix_edit_distance(query_word, word, max_distance) <= max_distance
+        ]
+
+    def _prefixed_words(self, prefix: str):
+        start = bisect_left(self._words, (prefix,))
+        for i in range(start, len(self._words)):
+            entry = self._words[i]
+            if not entry[0].startswith(prefix):
+                break
+            yield entry
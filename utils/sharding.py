@@ -0,0 +1,58 @@
+from typing import Optional
+
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    """
+    The shard Discord routes a guild to.
+    """
+    return (guild_id >> 22) % shard_count
+
+
+def parse_shard_ids(value: Optional[str]) -> Optional[list[int]]:
+    """
+    Parse a shard list like "0-3,6", None or empty means every shard.
+    """
+    if not value:
+        return None
+
+    shard_ids = []
+    for part in value.split(","):
+        start, _, end = part.strip().partition("-")
+        shard_ids.extend(range(int(start), int(end or start) + 1))
+    return sorted(set(shard_ids))
+
+
+def split_shards(shard_count: int, processes: int) -> list[list[int]]:
+    """
+    Spread the shards over the processes, as evenly as possible.
+    """
+    return [list(range(shard_count))[i::processes] for i in range(processes)]
+
+
+class ShardOwnership:
+    """
+    Tells whether a channel belongs to the guild shards of this process, so
+    processes sharing the storage each notify only their own channels.
+
+    A channel is owned once it is in the bot cache (only the guilds of our
+    shards are) and its guild maps to one of our shards. An unsharded bot
+    owns every channel it can see.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def owns_channel(self, channel_id: int) -> bool:
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            return False
+
+        shard_ids = getattr(self.bot, "shard_ids", None)
+        if not shard_ids:
+            return True
+
+        guild = getattr(channel, "guild", None)
+        if guild is None:
+            # DMs are received by shard 0
+            return 0 in shard_ids
+        return shard_for_guild(guild.id, self.bot.shard_count) in shard_ids
@@ -0,0 +1,48 @@
+from typing import Any, Awaitable, Callable, Hashable
+import asyncio
+
+
+# Result handed to the waiters when the caller running the load is cancelled
+_LEADER_CANCELLED = object()
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent loads: callers asking for a key that is already
+    being loaded wait for that load instead of starting their own.
+
+    A cancelled caller only cancels itself. When it was running the load, the
+    waiters elect a new one among them and start over.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[Any]]):
+        future = self._inflight.get(key)
+        while future is not None:
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                return result
+            future = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
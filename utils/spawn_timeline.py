@@ -0,0 +1,144 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from typing import Optional
+from zoneinfo import ZoneInfo
+from models import GatheringItem
+from utils.et_time import CLOCK, ET_DAY_MS, ET_HOUR_MS, EorzeaClock, format_spawn_status
+
+ET_MINUTE_MS = 60_000
+
+
+class SpawnTimeline:
+    """
+    Every spawn window of the catalog laid out on one ET day.
+
+    The ET day repeats every 70 real minutes, so the windows are computed once
+    as a sorted list of (ET offset of day, item position, duration) and queries are
+    bisect lookups on it. Offsets and durations are in ET milliseconds.
+
+    spawns, the (item id, ET hours, duration in ET hours) of each item, can be
+    given to build the timeline of a lazily loaded catalog without building its items.
+    """
+
+    def __init__(
+            self,
+            items: Sequence[GatheringItem],
+            clock: EorzeaClock = CLOCK,
+            spawns: Optional[Sequence[tuple[int, list[int], int]]] = None,
+    ):
+        self.items = items
+        self.clock = clock
+        self._entries: list[tuple[int, int, int]] = []
+        # Sorted spawn offsets and window duration of each item
+        self._windows: dict[int, tuple[list[int], int]] = {}
+        # Latest convert result of each item, valid for one ET minute
+        self._status_cache: dict[int, tuple[int, ZoneInfo, tuple[str, str]]] = {}
+
+        if spawns is None:
+            spawns = [(item.id, item.node.time, item.node.node_duration) for item in items]
+
+        for position, (item_id, et_hours, duration_et_hours) in enumerate(spawns):
+            duration = duration_et_hours * ET_HOUR_MS
+            offsets = sorted({hour * ET_HOUR_MS for hour in et_hours})
+            self._windows[item_id] = (offsets, duration)
+            for offset in offsets:
+                self._entries.append((offset, position, duration))
+
+        self._entries.sort(key=lambda entry: entry[0])
+        self._offsets = [entry[0] for entry in self._entries]
+        self.max_duration = max((entry[2] for entry in self._entries), default=0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def active(self, at_ms: Optional[int] = None) -> list[tuple[GatheringItem, int]]:
+        """
+        Items with an open spawn window, soonest to close first.
+
+        :return: (item, real timestamp in ms at which the window closes) pairs.
+        """
+        at_ms = self.clock.now_ms() if at_ms is None else at_ms
+        et_now = self.clock.to_et_ms(at_ms)
+
+        ends: dict[int, int] = {}
+        for spawn_et, position, duration in self._between(et_now - self.max_duration + 1, et_now + 1):
+            end_et = spawn_et + duration
+            if end_et > et_now and end_et > ends.get(position, 0):
+                ends[position] = end_et
+
+        active = [(self.items[position], self.clock.to_real_ms(end_et)) for position, end_et in ends.items()]
+        active.sort(key=lambda pair: pair[1])
+        return active
+
+    def upcoming(self, within_ms: int, at_ms: Optional[int] = None) -> list[tuple[GatheringItem, int]]:
+        """
+        Spawns in the next within_ms real milliseconds, in order.
+
+        :return: (item, real timestamp in ms of the spawn) pairs.
+        """
+        at_ms = self.clock.now_ms() if at_ms is None else at_ms
+        et_now = self.clock.to_et_ms(at_ms)
+        et_until = self.clock.to_et_ms(at_ms + within_ms)
+
+        return [
+            (self.items[position], self.clock.to_real_ms(spawn_et))
+            for spawn_et, position, _ in self._between(et_now + 1, et_until + 1)
+        ]
+
+    def window_end_ms(self, item_id: int, at_ms: Optional[int] = None) -> Optional[int]:
+        at_ms = self.clock.now_ms() if at_ms is None else at_ms
+        et_now = self.clock.to_et_ms(at_ms)
+        offsets, duration = self._windows[item_id]
+        if not offsets:
+            return None
+
+        # All windows of a node have the same length, the last spawn closes last
+        day_start = et_now - et_now % ET_DAY_MS
+        i = bisect_right(offsets, et_now - day_start)
+        last_spawn = day_start + offsets[i - 1] if i else day_start - ET_DAY_MS + offsets[-1]
+
+        end_et = last_spawn + duration
+        return self.clock.to_real_ms(end_et) if end_et > et_now else None
+
+    def next_spawn_ms(self, item_id: int, at_ms: Optional[int] = None) -> int:
+        at_ms = self.clock.now_ms() if at_ms is None else at_ms
+        et_now = self.clock.to_et_ms(at_ms)
+        offsets, _ = self._windows[item_id]
+
+        day_start = et_now - et_now % ET_DAY_MS
+        i = bisect_right(offsets, et_now - day_start)
+        next_spawn = day_start + offsets[i] if i < len(offsets) else day_start + ET_DAY_MS + offsets[0]
+        return self.clock.to_real_ms(next_spawn)
+
+    def convert(self, item: GatheringItem, user_timezone: ZoneInfo, at_ms: Optional[int] = None) -> tuple[str, str]:
+        """
+        Same result as utils.et_time.convert for the node of item. Spawns and
+        window ends fall on ET hours, so the result is reused for a whole ET minute.
+        """
+        at_ms = self.clock.now_ms() if at_ms is None else at_ms
+        et_minute = self.clock.to_et_ms(at_ms) // ET_MINUTE_MS
+
+        cached = self._status_cache.get(item.id)
+        if cached is not None and cached[0] == et_minute and cached[1] == user_timezone:
+            return cached[2]
+
+        end_ms = self.window_end_ms(item.id, at_ms)
+        if end_ms is not None:
+            status = format_spawn_status(end_ms, None, user_timezone)
+        else:
+            status = format_spawn_status(None, self.next_spawn_ms(item.id, at_ms), user_timezone)
+
+        self._status_cache[item.id] = (et_minute, user_timezone, status)
+        return status
+
+    def _between(self, et_from: int, et_to: int):
+        """
+        Yields (absolute ET spawn time, item position, duration) for the spawns in [et_from, et_to).
+        """
+        day_start = et_from - et_from % ET_DAY_MS
+        while day_start < et_to:
+            lo = bisect_left(self._offsets, et_from - day_start) if et_from > day_start else 0
+            hi = bisect_left(self._offsets, et_to - day_start)
+            for offset, position, duration in self._entries[lo:hi]:
+                yield day_start + offset, position, duration
+            day_start += ET_DAY_MS